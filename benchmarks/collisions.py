@@ -0,0 +1,105 @@
+import argparse, random, time
+
+from game.simulation import EnemyFormation, SpatialHash, Player, Bullet
+from utils.game_constants import DIFFICULTY_SETTINGS, ENEMY_SPACING, PLAYER_Y, SHIP_SIZE
+
+# Worst case for the bullet loop: the largest formation and fleet the settings allow, with the screen full of bullets.
+# Run from the repo root with python -m benchmarks.collisions
+
+WIDTH, HEIGHT = 1280, 720
+
+def make_scene(rng, bullets_per_side):
+    rows, cols = DIFFICULTY_SETTINGS["enemy_rows"][2], DIFFICULTY_SETTINGS["enemy_cols"][2]
+    player_count = DIFFICULTY_SETTINGS["player_count"][2]
+
+    formation = EnemyFormation(WIDTH / 2 - (cols - 1) * ENEMY_SPACING / 2, HEIGHT * 0.9, rows, cols)
+    players = [Player(rng.uniform(SHIP_SIZE / 2, WIDTH - SHIP_SIZE / 2), PLAYER_Y) for _ in range(player_count)]
+
+    # most shots are in flight between the ships, the rest land around them for hits and near misses
+    player_bullets = [Bullet(rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT), 1) for _ in range(bullets_per_side)]
+    enemy_bullets = [Bullet(rng.choice(players).center_x + rng.uniform(-SHIP_SIZE, SHIP_SIZE), PLAYER_Y + rng.uniform(-SHIP_SIZE, SHIP_SIZE), -1) for _ in range(bullets_per_side)]
+
+    return formation, players, player_bullets, enemy_bullets
+
+def brute_force(formation, players, bullets):
+    # the loop the game and env used before the broad phase
+    hits = []
+    for bullet in bullets:
+        if bullet.direction_y == 1:
+            for enemy in formation.enemies:
+                if bullet.collides_with(enemy):
+                    formation.remove_enemy(enemy)
+                    hits.append((enemy.row, enemy.col))
+                    break
+        else:
+            for player in players:
+                if bullet.collides_with(player):
+                    hits.append(id(player))
+                    players.remove(player)
+                    break
+        hits.append(None)
+
+    return hits
+
+def broad_phase(formation, players, bullets):
+    hits = []
+    player_hash = SpatialHash(SHIP_SIZE * 2)
+    player_hash.build(players)
+
+    for bullet in bullets:
+        if bullet.direction_y == 1:
+            enemy = formation.enemy_hit_by(bullet)
+            if enemy is not None:
+                formation.remove_enemy(enemy)
+                hits.append((enemy.row, enemy.col))
+        else:
+            hit = player_hash.first_hit(bullet)
+            if hit is not None:
+                key, player = hit
+                player_hash.remove(key, player)
+                hits.append(id(player))
+                players.remove(player)
+        hits.append(None)
+
+    return hits
+
+def run(resolve, scene):
+    formation, players, player_bullets, enemy_bullets = scene
+    formation.create_formation()
+    bullets = player_bullets + enemy_bullets
+
+    start = time.perf_counter()
+    hits = resolve(formation, list(players), bullets)
+    return hits, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--bullets", type=int, default=500, help="bullets per side per frame")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    totals = {"brute force": 0.0, "broad phase": 0.0}
+    hit_count = 0
+
+    for _ in range(args.frames):
+        scene = make_scene(rng, args.bullets)
+
+        expected, elapsed = run(brute_force, scene)
+        totals["brute force"] += elapsed
+
+        hits, elapsed = run(broad_phase, scene)
+        totals["broad phase"] += elapsed
+
+        if hits != expected:
+            raise SystemExit("broad phase hits differ from brute force")
+
+        hit_count += sum(hit is not None for hit in hits)
+
+    print(f"{args.frames} frames, {2 * args.bullets} bullets per frame, {hit_count} hits, identical results")
+    for name, total in totals.items():
+        print(f"{name:>12}: {1000 * total / args.frames:.3f} ms/frame")
+
+if __name__ == "__main__":
+    main()
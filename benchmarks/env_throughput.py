@@ -0,0 +1,163 @@
+import argparse, json, os, sys, time, tracemalloc, numpy as np
+
+from stable_baselines3.common.vec_env import DummyVecEnv
+
+from utils.rl import SpaceInvadersEnv
+from utils.vec_env import SpaceInvadersVecEnv, SharedMemoryVecEnv
+from utils.game_constants import DIFFICULTY_LEVELS
+
+# Throughput of the env backends over the difficulty presets and n_envs, with fixed seeds and a fixed action schedule.
+# Results go to JSON, and can be compared against a stored baseline to catch regressions.
+# Run from the repo root with python -m benchmarks.env_throughput
+
+BACKENDS = ["env", "dummy", "native", "shared_memory"]
+DIFFICULTIES = [name for name, level in DIFFICULTY_LEVELS.items() if level] # Custom has no settings of its own
+
+# metric -> True when bigger is better
+METRICS = {"steps_per_sec": True, "reset_us": False, "step_p50_us": False, "step_p99_us": False}
+
+class ScalarEnv():
+    # the plain gym env behind the same reset/step calls as a vec env with one env
+    def __init__(self, difficulty, seed):
+        self.env = SpaceInvadersEnv(difficulty=difficulty)
+        self.seed = seed
+
+    def reset(self):
+        return self.env.reset(seed=self.seed)[0]
+
+    def step(self, actions):
+        obs, reward, terminated, truncated, info = self.env.step(int(actions[0]))
+        if terminated or truncated:
+            obs, _ = self.env.reset()
+
+        return obs
+
+    def close(self):
+        pass
+
+def make_env(backend, difficulty, n_envs, seed):
+    if backend == "env":
+        return ScalarEnv(difficulty, seed)
+    elif backend == "dummy":
+        env = DummyVecEnv([lambda: SpaceInvadersEnv(difficulty=difficulty) for _ in range(n_envs)])
+    elif backend == "native":
+        env = SpaceInvadersVecEnv(n_envs, difficulty=difficulty)
+    elif backend == "shared_memory":
+        env = SharedMemoryVecEnv(n_envs, min(n_envs, os.cpu_count() or 1), difficulty=difficulty)
+    else:
+        raise ValueError(f"Unknown backend: {backend}")
+
+    env.seed(seed)
+    return env
+
+def run_case(backend, difficulty, n_envs, steps, resets, alloc_steps, seed):
+    if backend == "env":
+        n_envs = 1
+
+    env = make_env(backend, difficulty, n_envs, seed)
+    actions = np.random.default_rng(seed).integers(0, 4, (steps + alloc_steps, n_envs))
+
+    try:
+        start = time.perf_counter()
+        for _ in range(resets):
+            env.reset()
+        reset_us = 1e6 * (time.perf_counter() - start) / resets
+
+        env.reset()
+        latencies = np.zeros(steps)
+        start = time.perf_counter()
+        for i in range(steps):
+            step_start = time.perf_counter()
+            env.step(actions[i])
+            latencies[i] = time.perf_counter() - step_start
+        elapsed = time.perf_counter() - start
+
+        # tracemalloc slows everything down, so allocations get their own steps after the timed ones
+        # only this process is traced, shared_memory workers are not
+        tracemalloc.start()
+        transient_bytes = 0
+        blocks = sys.getallocatedblocks()
+        for i in range(steps, steps + alloc_steps):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            env.step(actions[i])
+            transient_bytes += tracemalloc.get_traced_memory()[1] - before
+        blocks = sys.getallocatedblocks() - blocks
+        tracemalloc.stop()
+    finally:
+        env.close()
+
+    return {
+        "backend": backend,
+        "difficulty": difficulty,
+        "n_envs": n_envs,
+        "steps_per_sec": steps * n_envs / elapsed,
+        "reset_us": reset_us,
+        "step_p50_us": 1e6 * float(np.percentile(latencies, 50)),
+        "step_p99_us": 1e6 * float(np.percentile(latencies, 99)),
+        "alloc_bytes_per_step": transient_bytes / max(1, alloc_steps),
+        "net_blocks_per_step": blocks / max(1, alloc_steps)
+    }
+
+def case_key(result):
+    return f"{result['backend']}/{result['difficulty']}/{result['n_envs']}"
+
+def compare(results, baseline, threshold):
+    # relative change per metric, a regression is a change in the bad direction bigger than threshold
+    regressions = []
+    baseline = {case_key(result): result for result in baseline["results"]}
+
+    for result in results:
+        old = baseline.get(case_key(result))
+        if old is None:
+            continue
+
+        for metric, higher_is_better in METRICS.items():
+            change = (result[metric] - old[metric]) / max(abs(old[metric]), 1e-12)
+            worse = -change if higher_is_better else change
+
+            if worse > threshold:
+                regressions.append(f"{case_key(result)} {metric}: {old[metric]:.1f} -> {result[metric]:.1f} ({100 * change:+.1f}%)")
+
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", nargs="+", default=["env", "native"], choices=BACKENDS)
+    parser.add_argument("--difficulties", nargs="+", default=DIFFICULTIES, choices=DIFFICULTIES)
+    parser.add_argument("--n-envs", nargs="+", type=int, default=[16, 128], help="ignored by the env backend")
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--resets", type=int, default=50)
+    parser.add_argument("--alloc-steps", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="JSON from an earlier --output to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change that counts as a regression")
+    args = parser.parse_args()
+
+    results = []
+    for backend in args.backends:
+        for difficulty in args.difficulties:
+            for n_envs in ([1] if backend == "env" else args.n_envs):
+                result = run_case(backend, difficulty, n_envs, args.steps, args.resets, args.alloc_steps, args.seed)
+                results.append(result)
+
+                print(f"{case_key(result):>32}: {result['steps_per_sec']:10.0f} steps/s  reset {result['reset_us']:8.1f} us  "
+                      f"p50 {result['step_p50_us']:8.1f} us  p99 {result['step_p99_us']:8.1f} us  "
+                      f"{result['alloc_bytes_per_step']:8.0f} B/step  {result['net_blocks_per_step']:+.2f} blocks/step")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"seed": args.seed, "steps": args.steps, "python": sys.version.split()[0], "results": results}, file, indent=4)
+
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            regressions = compare(results, json.load(file), args.threshold)
+
+        if regressions:
+            raise SystemExit("Regressions over the baseline:\n" + "\n".join(regressions))
+
+        print(f"No regressions over {args.threshold:.0%} against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
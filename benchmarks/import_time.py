@@ -0,0 +1,62 @@
+import argparse, subprocess, sys, json
+
+# Import-time report for the modules on the way to the first interactive frame, using python -X importtime.
+# Fails when one of them pulls in a heavy framework, or takes longer than --budget-ms.
+# Run from the repo root with python -m benchmarks.import_time
+
+ENTRY_MODULES = ["menus.main", "menus.mode_selector", "menus.settings", "menus.train_model", "game.play"]
+HEAVY_MODULES = ["torch", "stable_baselines3", "gymnasium", "matplotlib", "pandas"]
+
+def import_times(module):
+    # {module: (self us, cumulative us)} for a fresh interpreter importing module
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(f"importing {module} failed:\n{result.stderr[-2000:]}")
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+            continue
+
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+
+    return times
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("modules", nargs="*", default=ENTRY_MODULES)
+    parser.add_argument("--top", type=int, default=10, help="slowest modules to list per entry")
+    parser.add_argument("--budget-ms", type=float, default=None, help="fail when an entry module takes longer than this")
+    parser.add_argument("--json", default=None, help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = {}
+    failures = []
+
+    for module in args.modules:
+        times = import_times(module)
+        total_ms = times[module][1] / 1000
+        heavy = sorted(name for name in times if name.split(".")[0] in HEAVY_MODULES and "." not in name)
+        slowest = sorted(times.items(), key=lambda item: item[1][0], reverse=True)[:args.top]
+
+        report[module] = {"total_ms": total_ms, "modules": len(times), "heavy": heavy, "slowest_self_ms": {name: t[0] / 1000 for name, t in slowest}}
+
+        print(f"{module}: {total_ms:.1f} ms, {len(times)} modules")
+        for name, (self_us, cumulative_us) in slowest:
+            print(f"    {self_us / 1000:8.1f} ms self {cumulative_us / 1000:8.1f} ms cumulative  {name}")
+
+        if heavy:
+            failures.append(f"{module} imports {', '.join(heavy)}")
+        if args.budget_ms is not None and total_ms > args.budget_ms:
+            failures.append(f"{module} took {total_ms:.1f} ms, over the {args.budget_ms} ms budget")
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=4)
+
+    if failures:
+        raise SystemExit("\n".join(failures))
+
+if __name__ == "__main__":
+    main()
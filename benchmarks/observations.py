@@ -0,0 +1,98 @@
+import argparse, random, time, numpy as np
+
+from utils.rl import SpaceInvadersEnv
+from utils.game_constants import DIFFICULTY_LEVELS
+
+# Checks the incremental observations against a from-scratch rebuild on every step, and times both.
+# Run from the repo root with python -m benchmarks.observations
+
+def reference_obs(env):
+    # the observation as it was built before it went incremental, with the same scans over every live enemy
+    enemies = env.enemy_formation.enemies
+    player = env.player
+
+    if enemies and env.player_alive:
+        nearest = min(enemies, key=lambda e: abs(e.center_x - player.center_x))
+        enemy_x = (nearest.center_x - player.center_x) / float(env.width)
+        enemy_y = (nearest.center_y - player.center_y) / float(env.height)
+    else:
+        enemy_x = 2.0
+        enemy_y = 2.0
+
+    lowest = min(enemies, key=lambda e: e.center_y) if enemies else None
+    if lowest is not None and env.player_alive:
+        lowest_dy = (lowest.center_y - player.center_y) / float(env.height)
+    else:
+        lowest_dy = 2.0
+
+    enemy_bullets = [b for b in env.bullets if b.direction_y == -1]
+    nb = min(enemy_bullets, key=lambda b: abs(b.center_x - player.center_x) + abs(b.center_y - player.center_y)) if enemy_bullets else None
+    if nb is not None and env.player_alive:
+        bx = (nb.center_x - player.center_x) / float(env.width)
+        by = (nb.center_y - player.center_y) / float(env.height)
+    else:
+        bx = 2.0
+        by = 2.0
+
+    enemy_count = len(enemies) / float(max(1, env.difficulty_settings["enemy_rows"] * env.difficulty_settings["enemy_cols"]))
+    player_x_norm = player.center_x / float(env.width) if env.player_alive else 0.5
+
+    enemy_dispersion = 0.0
+    if enemies:
+        xs = np.array([e.center_x for e in enemies], dtype=np.float32)
+        enemy_dispersion = float(xs.std()) / float(env.width)
+
+    can_shoot = 1.0 if (env.player_alive and env.current_cooldown <= 0) else 0.0
+
+    return np.array([
+        player_x_norm,
+        enemy_x,
+        enemy_y,
+        lowest_dy,
+        bx,
+        by,
+        env.player_speed,
+        enemy_count,
+        enemy_dispersion,
+        can_shoot,
+        env.player_respawns_remaining / float(max(1, env.player_respawns)),
+        env.enemy_respawns_remaining / float(max(1, env.enemy_respawns))
+    ], dtype=np.float32)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, default=20_000, help="steps per difficulty")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    actions = random.Random(args.seed)
+    totals = {"reference": 0.0, "incremental": 0.0}
+    difficulties = [name for name, level in DIFFICULTY_LEVELS.items() if level] # Custom has no settings of its own
+
+    for difficulty in difficulties:
+        env = SpaceInvadersEnv(difficulty=difficulty)
+        obs, _ = env.reset(seed=args.seed)
+
+        for step in range(args.steps):
+            start = time.perf_counter()
+            expected = reference_obs(env)
+            totals["reference"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            obs = env._obs()
+            totals["incremental"] += time.perf_counter() - start
+
+            if obs.tobytes() != expected.tobytes():
+                raise SystemExit(f"{difficulty} step {step}: {obs} != {expected}")
+
+            obs, reward, terminated, truncated, info = env.step(actions.randrange(4))
+            if terminated or truncated:
+                obs, _ = env.reset()
+
+    steps = args.steps * len(difficulties)
+    print(f"{steps} steps over {len(difficulties)} difficulties, observations bit-identical")
+    for name, total in totals.items():
+        print(f"{name:>12}: {1e6 * total / steps:.2f} us/observation")
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,95 @@
-import arcade, arcade.gui, random, time
+import arcade, arcade.gui, random, time, logging, json, os, zlib, math, numpy as np
 
-from utils.constants import button_style, ENEMY_ATTACK_SPEED, ENEMY_SPEED
+from utils.constants import button_style, ENEMY_ATTACK_SPEED, ENEMY_SPEED, PLAYER_ATTACK_SPEED, BULLET_SPEED, PLAYER_Y, SHIP_SIZE, TICK_RATE, MAX_FRAME_TIME
 from utils.preload import button_texture, button_hovered_texture
+from utils.utils import get_atlas_usage
+from utils.policy import get_policy, POLICY_BACKENDS
+from utils.replay_file import Replay
 
-from stable_baselines3 import PPO
+from game import simulation
+from game.sprites import PlayerSprite, BulletSprite, SpriteCache, EnemyLayer, DrawStats
 
-from game.sprites import EnemyFormation, Player, Bullet
+# left, right, down, up and shoot for the enemies, each recorded as one bit of the tick's input
+ENEMY_KEYS = ((arcade.key.LEFT, arcade.key.A), (arcade.key.RIGHT, arcade.key.D), (arcade.key.DOWN, arcade.key.S), (arcade.key.UP, arcade.key.W), (arcade.key.SPACE,))
 
 class Game(arcade.gui.UIView):
-    def __init__(self, pypresence_client, settings):
+    # A match is replayed from its seed and its inputs: per tick the enemy keys as three 2 bit symbols, then the
+    # agent's action for every player on the ticks it decides, in the same FCRP file as env replays. With a replay
+    # the inputs come from it instead of the keyboard and the policy.
+    def __init__(self, pypresence_client, settings, replay=None):
         super().__init__()
 
         self.settings = settings
         self.pypresence_client = pypresence_client
         self.pypresence_client.update(state="Invading Space")
 
+        # all of the match's randomness, so the seed and the inputs are enough to replay it
+        self.playback = replay
+        self.input_index = 0
+        self.diverged_at = None
+        self.seed = replay.seed if replay is not None else random.getrandbits(32)
+        self.rng = random.Random(self.seed)
+
         self.anchor = self.add_widget(arcade.gui.UIAnchorLayout(size_hint=(1, 1)))
         
-        self.spritelist = arcade.SpriteList()
+        # A sprite list per layer, so bullets coming and going never touch the ships' lists. Enemies and bullets keep
+        # their sprites for the whole game and hide them instead of leaving their list, only the few players come and go.
+        self.player_spritelist = arcade.SpriteList(capacity=settings["player_count"])
+        self.sprites = {} # player -> sprite drawing it
+        self.sprite_cache = SpriteCache()
+        self.draw_stats = DrawStats()
+
+        # Bullets come from a pool and each pooled bullet keeps its sprite for the whole game, hidden while it's free.
+        # A bullet crosses the window in height / BULLET_SPEED ticks, every player fires at most once per
+        # PLAYER_ATTACK_SPEED and the enemies once per ENEMY_ATTACK_SPEED, so that many are made up front. The pool
+        # grows past it when a respawned fleet fires while the last one's shots are still up.
+        lifetime = self.window.height / (BULLET_SPEED * TICK_RATE)
+        capacity = settings["player_count"] * (math.ceil(lifetime / PLAYER_ATTACK_SPEED) + 1) + math.ceil(lifetime / ENEMY_ATTACK_SPEED) + 1
+        self.bullet_pool = simulation.BulletPool(capacity, grow=True)
+        self.bullet_spritelist = arcade.SpriteList(capacity=capacity)
+        self.bullet_sprites = {}
+        for bullet in self.bullet_pool.free:
+            self.add_bullet_sprite(bullet).visible = False
+
+        # the simulation advances in fixed ticks on its own clock, on_draw interpolates sprites between the last two ticks
+        self.tick = 1 / TICK_RATE
+        self.accumulator = 0.0
+        self.sim_time = 0.0
+        self.last_update = time.perf_counter()
 
         self.players = []
-        for _ in range(settings["player_count"]):
-            self.players.append(Player(self.window.width / 2 + random.randint(int(-self.window.width / 3), int(self.window.width / 3)), 100))  # not actually player
-            self.spritelist.append(self.players[-1])
+        self.player_hash = simulation.SpatialHash(SHIP_SIZE * 2)
+        self.spawn_players()
         
-        self.model = PPO.load("invader_agent.zip")
+        self.recording = None
+        if replay is None:
+            with open("settings.json", "r") as file:
+                game_settings = json.load(file)
+
+            self.model = get_policy("invader_agent.zip", POLICY_BACKENDS.get(game_settings.get("policy_backend", "NumPy"), "numpy"))
+            self.frame_skip = getattr(self.model, "frame_skip", 1) # the agent decides every frame_skip ticks, like it did in training
+
+            if game_settings.get("record_matches", False):
+                self.recording = Replay(self.seed, {"width": self.window.width, "height": self.window.height, "frame_skip": self.frame_skip, "game": dict(settings)}, kind="game")
+        else:
+            self.model = None
+            self.frame_skip = replay.settings["frame_skip"]
 
-        self.enemy_formation = EnemyFormation(self.window.width / 2 + random.randint(int(-self.window.width / 3), int(self.window.width / 3)), self.window.height * 0.9, self.spritelist, settings["enemy_rows"], settings["enemy_cols"])
-        self.player_bullets: list[Bullet] = []
-        self.enemy_bullets: list[Bullet] = []
+        self.ticks = 0
+        self.observations = np.zeros((settings["player_count"], 12), dtype=np.float32)
+
+        self.enemy_formation = simulation.EnemyFormation(self.window.width / 2 + self.rng.randint(int(-self.window.width / 3), int(self.window.width / 3)), self.window.height * 0.9, settings["enemy_rows"], settings["enemy_cols"], rng=self.rng)
+        self.enemy_layer = EnemyLayer(self.enemy_formation)
+        self.player_bullets: list[simulation.Bullet] = []
+        self.enemy_bullets: list[simulation.Bullet] = []
 
         self.player_respawns = settings["player_respawns"]
         self.enemy_respawns = settings["enemy_respawns"]
 
         self.score = 0
 
-        self.last_enemy_shoot = time.perf_counter()
+        self.last_enemy_shoot = self.sim_time
+        self.last_atlas_log = time.perf_counter()
 
         self.game_over = False
 
@@ -46,63 +100,191 @@ class Game(arcade.gui.UIView):
         self.back_button.on_click = lambda event: self.main_exit()
         self.score_label = self.anchor.add(arcade.gui.UILabel("Score: 0", font_size=24), anchor_x="center", anchor_y="top")
 
+    def add_player_sprite(self, player):
+        sprite = self.sprite_cache.get(PlayerSprite, player)
+        self.sprites[player] = sprite
+        self.player_spritelist.append(sprite)
+
+    def remove_player_sprite(self, player):
+        sprite = self.sprites.pop(player)
+        self.player_spritelist.remove(sprite)
+        self.sprite_cache.release(sprite)
+
+    def add_bullet_sprite(self, bullet):
+        sprite = BulletSprite(bullet)
+        self.bullet_sprites[bullet] = sprite
+        self.bullet_spritelist.append(sprite)
+
+        return sprite
+
+    def release_bullet(self, bullet):
+        self.bullet_pool.release(bullet)
+        self.bullet_sprites[bullet].visible = False
+
+    def spawn_players(self):
+        for _ in range(self.settings["player_count"]):
+            self.players.append(simulation.Player(self.window.width / 2 + self.rng.randint(int(-self.window.width / 3), int(self.window.width / 3)), PLAYER_Y, now=self.sim_time))  # not actually player
+            self.add_player_sprite(self.players[-1])
+
     def main_exit(self):
+        self.save_recording()
+
+        if self.playback is not None: # watched from python -m utils.replay, there's no menu to go back to
+            self.window.close()
+            return
+
         from menus.main import Main
         self.window.show_view(Main(self.pypresence_client))
 
+    def save_recording(self):
+        # kept in replays/, watch one with python -m utils.replay replays/<file> --render
+        if self.recording is None or not self.ticks:
+            return
+
+        os.makedirs("replays", exist_ok=True)
+        self.recording.save(os.path.join("replays", time.strftime("match_%Y%m%d_%H%M%S.fcrp")))
+        self.recording = None
+
+    def read_inputs(self, count):
+        symbols = self.playback.actions[self.input_index:self.input_index + count]
+        self.input_index += count
+
+        return symbols
+
+    def enemy_keys(self):
+        # five bools in ENEMY_KEYS order
+        if self.playback is not None:
+            low, high, shoot = self.read_inputs(3)
+            return bool(low & 1), bool(low >> 1), bool(high & 1), bool(high >> 1), bool(shoot)
+
+        keys = [any(self.window.keyboard[key] for key in alternatives) for alternatives in ENEMY_KEYS]
+        if self.recording is not None:
+            self.recording.actions.extend((keys[0] | keys[1] << 1, keys[2] | keys[3] << 1, keys[4]))
+
+        return keys
+
+    def agent_actions(self):
+        if self.playback is not None:
+            return list(self.read_inputs(len(self.players)))
+
+        obs = simulation.observe_players(self.players, self.enemy_formation, self.enemy_bullets, self.window.width, self.window.height, self.player_respawns / self.settings["player_respawns"], self.enemy_respawns / self.settings["enemy_respawns"], out=self.observations[:len(self.players)], now=self.sim_time)
+        actions, _ = self.model.predict(obs, deterministic=True)
+        if self.recording is not None:
+            self.recording.actions.extend(int(action) for action in actions)
+
+        return actions
+
+    def check_state(self):
+        # a checksum every checksum_interval ticks, recorded or compared with the recording
+        replay = self.recording or self.playback
+        if replay is None or self.ticks % replay.checksum_interval:
+            return
+
+        checksum = self.state_checksum()
+        if self.recording is not None:
+            self.recording.checksums.append(checksum)
+            return
+
+        index = self.ticks // replay.checksum_interval - 1
+        if self.diverged_at is None and index < len(replay.checksums) and replay.checksums[index] != checksum:
+            self.diverged_at = self.ticks
+            logging.warning(f"Replay diverged from the recording at tick {self.ticks}")
+
+    def state_checksum(self):
+        formation = self.enemy_formation
+        scalars = np.array([self.score, self.player_respawns, self.enemy_respawns, self.last_enemy_shoot, formation.start_x, formation.start_y], dtype=np.float64)
+        players = np.array([(player.center_x, player.last_shoot) for player in self.players], dtype=np.float64)
+        bullets = np.array([(b.center_x, b.center_y, b.direction_y) for b in self.player_bullets + self.enemy_bullets], dtype=np.float64)
+
+        return zlib.crc32(b"".join((scalars.tobytes(), formation.col_x.tobytes(), formation.row_y.tobytes(), formation.alive.tobytes(), players.tobytes(), bullets.tobytes())))
+
     def on_update(self, delta_time):
+        self.last_update = time.perf_counter()
+
         if self.game_over:
             return
 
-        if self.window.keyboard[arcade.key.LEFT] or self.window.keyboard[arcade.key.A]:
+        self.accumulator += min(delta_time, MAX_FRAME_TIME)
+        while self.accumulator >= self.tick and not self.game_over:
+            if self.playback is not None and self.input_index >= len(self.playback.actions):
+                self.game_over = True # the recording stopped here, the match was left before it ended
+                break
+
+            self.accumulator -= self.tick
+            self.sim_time += self.tick
+            self.tick_simulation()
+
+        if time.perf_counter() - self.last_atlas_log >= 10:
+            self.last_atlas_log = time.perf_counter()
+            logging.debug(f"Atlas usage: {get_atlas_usage(self.player_spritelist.atlas)}, sprites created: {self.sprite_cache.created}, bullets created: {self.bullet_pool.created}")
+            logging.debug(f"Drawing: {self.draw_stats.summary()}")
+            self.draw_stats.reset()
+
+        self.score_label.text = f"Score: {int(self.score)}"
+
+    def tick_simulation(self):
+        for sprite in self.player_spritelist:
+            sprite.save_previous()
+        for sprite in self.bullet_spritelist:
+            sprite.save_previous()
+        self.enemy_layer.save_previous()
+
+        left, right, down, up, shoot = self.enemy_keys()
+        if left:
             self.enemy_formation.move(self.window.width, self.window.height, "x", -ENEMY_SPEED)
-        if self.window.keyboard[arcade.key.RIGHT] or self.window.keyboard[arcade.key.D]:
+        if right:
             self.enemy_formation.move(self.window.width, self.window.height, "x", ENEMY_SPEED)
-        if self.window.keyboard[arcade.key.DOWN] or self.window.keyboard[arcade.key.S]:
+        if down:
             self.enemy_formation.move(self.window.width, self.window.height, "y", -ENEMY_SPEED)
-        if self.window.keyboard[arcade.key.UP] or self.window.keyboard[arcade.key.W]:
+        if up:
             self.enemy_formation.move(self.window.width, self.window.height, "y", ENEMY_SPEED)
-        if self.enemy_formation.enemies and self.window.keyboard[arcade.key.SPACE] and time.perf_counter() - self.last_enemy_shoot >= ENEMY_ATTACK_SPEED:
-            self.last_enemy_shoot = time.perf_counter()
+        if self.enemy_formation.count and shoot and self.sim_time - self.last_enemy_shoot >= ENEMY_ATTACK_SPEED:
+            self.last_enemy_shoot = self.sim_time
             enemy = self.enemy_formation.get_lowest_enemy()
             self.shoot(enemy.center_x, enemy.center_y, -1)
 
-        bullets_to_remove = []
+        # spent bullets go back to the pool right away, and the lists are compacted in one pass afterwards
+        removed = False
 
-        for bullet in self.player_bullets + self.enemy_bullets:
-            bullet.update()
-            
-            bullet_hit = False
-            if bullet.direction_y == 1:
-                for enemy in self.enemy_formation.enemies:
-                    if bullet.rect.intersection(enemy.rect):
+        self.player_hash.build(self.players)
+
+        for bullets in (self.player_bullets, self.enemy_bullets):
+            for bullet in bullets:
+                bullet.update()
+
+                bullet_hit = False
+                if bullet.direction_y == 1:
+                    enemy = self.enemy_formation.enemy_hit_by(bullet)
+                    if enemy is not None:
                         self.enemy_formation.remove_enemy(enemy)
-                        bullets_to_remove.append(bullet)
                         bullet_hit = True
-                        break
-            else:
-                for player in self.players:
-                    if bullet.rect.intersection(player.rect):
-                        self.spritelist.remove(player)
+                else:
+                    hit = self.player_hash.first_hit(bullet)
+                    if hit is not None:
+                        key, player = hit
+                        self.player_hash.remove(key, player)
+                        self.remove_player_sprite(player)
                         self.players.remove(player)
-                        bullets_to_remove.append(bullet)
                         bullet_hit = True
                         self.score += 75
-                        break
-                    
-            if not bullet_hit and bullet.center_y > self.window.height or bullet.center_y < 0:
-                bullets_to_remove.append(bullet)
 
-        for bullet_to_remove in bullets_to_remove:
-            self.spritelist.remove(bullet_to_remove)
+                if bullet_hit or bullet.center_y > self.window.height or bullet.center_y < 0:
+                    self.release_bullet(bullet)
+                    removed = True
 
-            if bullet_to_remove in self.enemy_bullets:
-                self.enemy_bullets.remove(bullet_to_remove)
-            elif bullet_to_remove in self.player_bullets:
-                self.player_bullets.remove(bullet_to_remove)
+        if removed:
+            self.player_bullets = [bullet for bullet in self.player_bullets if bullet.active]
+            self.enemy_bullets = [bullet for bullet in self.enemy_bullets if bullet.active]
+
+        # respawned players haven't decided yet, so they get a decision straight away
+        if self.players and (self.ticks % self.frame_skip == 0 or self.players[-1].action is None):
+            for player, action in zip(self.players, self.agent_actions()):
+                player.action = action
+
+        self.ticks += 1
 
         for player in self.players:
-            player.update(self.model, self.enemy_formation, self.enemy_bullets, self.window.width, self.window.height, self.player_respawns / self.settings["player_respawns"], self.enemy_respawns / self.settings["enemy_respawns"]) # not actually player
+            player.apply_action(player.action, now=self.sim_time) # not actually player
 
             if player.center_x > self.window.width:
                 player.center_x = self.window.width
@@ -116,29 +298,34 @@ class Game(arcade.gui.UIView):
         if len(self.players) == 0:
             if self.player_respawns > 0:
                 self.player_respawns -= 1
-                for _ in range(self.settings["player_count"]):
-                    self.players.append(Player(self.window.width / 2 + random.randint(int(-self.window.width / 3), int(self.window.width / 3)), 100))  # not actually player
-                    self.spritelist.append(self.players[-1])
+                self.spawn_players()
                 self.score += 300
             else:
                 self.game_over = True
                 self.game_over_label = self.anchor.add(arcade.gui.UILabel("You (The enemies) won!", font_size=48), anchor_x="center", anchor_y="center")
 
-        elif len(self.enemy_formation.enemies) == 0:
+        elif self.enemy_formation.count == 0:
             if self.enemy_respawns > 0:
                 self.enemy_respawns -= 1
-                self.enemy_formation.create_formation(self.window.width / 2 + random.randint(int(-self.window.width / 3), int(self.window.width / 3)), self.window.height * 0.9)
+                self.enemy_formation.create_formation(self.window.width / 2 + self.rng.randint(int(-self.window.width / 3), int(self.window.width / 3)), self.window.height * 0.9)
+                self.enemy_layer.save_previous() # the new formation appears in place instead of sliding over from the old one
             else:
                 self.game_over = True
                 self.game_over_label = self.anchor.add(arcade.gui.UILabel("You lost! The Players win!", font_size=48), anchor_x="center", anchor_y="center")
 
-        self.score += 5 * delta_time
-        
-        self.score_label.text = f"Score: {int(self.score)}"
+        self.score += 5 * self.tick
+
+        self.check_state()
+        if self.game_over:
+            self.save_recording()
 
     def shoot(self, x, y, direction_y):
-        bullet = Bullet(x, y, direction_y)
-        self.spritelist.append(bullet)
+        bullet = self.bullet_pool.spawn(x, y, direction_y)
+
+        sprite = self.bullet_sprites.get(bullet) or self.add_bullet_sprite(bullet)
+        sprite.save_previous()
+        sprite.sync()
+        sprite.visible = True
 
         if direction_y == 1:
             bullets = self.player_bullets
@@ -150,4 +337,20 @@ class Game(arcade.gui.UIView):
     def on_draw(self):
         super().on_draw()
 
-        self.spritelist.draw()
\ No newline at end of file
+        # updates can run less often than draws, so the time since the last one counts too
+        if self.game_over:
+            alpha = 1.0
+        else:
+            alpha = min(1.0, (self.accumulator + time.perf_counter() - self.last_update) / self.tick)
+
+        for sprite in self.player_spritelist:
+            sprite.sync(alpha)
+        self.enemy_layer.sync(alpha)
+        for sprite in self.bullet_spritelist:
+            if sprite.body.active:
+                sprite.sync(alpha)
+
+        self.draw_stats.frames += 1
+        self.draw_stats.draw(self.enemy_layer.spritelist)
+        self.draw_stats.draw(self.player_spritelist)
+        self.draw_stats.draw(self.bullet_spritelist)
\ No newline at end of file
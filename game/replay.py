@@ -0,0 +1,85 @@
+import arcade
+
+from game.sprites import PlayerSprite, EnemySprite, BulletSprite, SpriteCache
+from utils.replay import ReplayPlayer
+from utils.utils import FakePyPresence
+
+class ReplayView(arcade.View):
+    # Watches recorded episodes, speed env steps per frame. Sprites mirror the env's bodies like they do in Game.
+    def __init__(self, replays, speed=1):
+        super().__init__()
+
+        self.replays = list(replays)
+        self.speed = speed
+        self.player = None
+
+        self.spritelist = arcade.SpriteList()
+        self.sprites = {} # simulation body -> sprite drawing it
+        self.sprite_cache = SpriteCache()
+
+    def on_show_view(self):
+        self.next_replay()
+
+    def next_replay(self):
+        if not self.replays:
+            self.window.close()
+            return
+
+        self.player = ReplayPlayer(self.replays.pop(0))
+
+    def sync_sprites(self):
+        env = self.player.env
+        bodies = {enemy: EnemySprite for enemy in env.enemy_formation.enemies}
+        bodies.update((bullet, BulletSprite) for bullet in env.bullets)
+        if env.player_alive:
+            bodies[env.player] = PlayerSprite
+
+        for body in [body for body in self.sprites if body not in bodies]:
+            sprite = self.sprites.pop(body)
+            self.spritelist.remove(sprite)
+            self.sprite_cache.release(sprite)
+
+        for body, sprite_class in bodies.items():
+            if body not in self.sprites:
+                sprite = self.sprite_cache.get(sprite_class, body)
+                self.sprites[body] = sprite
+                self.spritelist.append(sprite)
+
+    def on_update(self, delta_time):
+        for _ in range(self.speed):
+            if self.player.done():
+                result = self.player.result()
+                if result["diverged_at"] is not None:
+                    print(f"Replay diverged from the recording at step {result['diverged_at']}")
+
+                self.next_replay()
+                if self.player is None or self.player.done():
+                    return
+
+            self.player.step()
+
+    def on_draw(self):
+        self.clear()
+
+        if self.player is None:
+            return
+
+        self.sync_sprites()
+        for sprite in self.spritelist:
+            sprite.sync()
+
+        self.spritelist.draw()
+
+def watch_replays(replays, speed=1):
+    settings = replays[0].settings
+    window = arcade.Window(settings["width"], settings["height"], "Fleet Commander Replay")
+    window.show_view(ReplayView(replays, speed))
+    arcade.run()
+
+def watch_match(replay):
+    # a recorded Game match, in a window the size it was played in
+    window = arcade.Window(replay.settings["width"], replay.settings["height"], "Fleet Commander Replay")
+
+    from game.play import Game # needs the window for its textures
+    window.show_view(Game(FakePyPresence(), dict(replay.settings["game"]), replay=replay))
+    arcade.run()
@@ -0,0 +1,372 @@
+import time, random, bisect, numpy as np
+
+from utils.game_constants import PLAYER_SPEED, BULLET_SPEED, BULLET_RADIUS, BULLET_CAPACITY, PLAYER_ATTACK_SPEED, SHIP_SIZE, ENEMY_SPACING
+
+# Headless game state. Nothing here touches arcade, sprites in game/sprites.py only mirror these objects for drawing.
+
+def circle_rect_overlap(cx, cy, radius, rx, ry, half_width, half_height):
+    dx = abs(cx - rx) - half_width
+    dy = abs(cy - ry) - half_height
+
+    if dx > radius or dy > radius:
+        return False
+
+    dx = dx if dx > 0 else 0.0
+    dy = dy if dy > 0 else 0.0
+
+    return dx * dx + dy * dy <= radius * radius
+
+class Body():
+    def __init__(self, x, y, width=SHIP_SIZE, height=SHIP_SIZE):
+        self.center_x = x
+        self.center_y = y
+        self.width = width
+        self.height = height
+
+class Bullet(Body):
+    def __init__(self, x, y, direction_y):
+        super().__init__(x, y, BULLET_RADIUS, BULLET_RADIUS)
+
+        self.direction_y = direction_y
+        self.active = True
+
+    def update(self):
+        self.center_y += self.direction_y * BULLET_SPEED
+
+    def collides_with(self, body):
+        return circle_rect_overlap(self.center_x, self.center_y, self.width / 2, body.center_x, body.center_y, body.width / 2, body.height / 2)
+
+class Enemy():
+    # One cell of an EnemyFormation. Positions live in the formation's arrays, so moving the formation never touches these.
+    width = SHIP_SIZE
+    height = SHIP_SIZE
+
+    def __init__(self, formation, row, col):
+        self.formation = formation
+        self.row = row
+        self.col = col
+
+    @property
+    def center_x(self):
+        return float(self.formation.col_x[self.col])
+
+    @property
+    def center_y(self):
+        return float(self.formation.row_y[self.row])
+
+class EnemyFormation():
+    # Struct of arrays: x per column, y per row and an alive mask, since every enemy sits on the same regular grid.
+    def __init__(self, start_x, start_y, rows, cols, rng=None):
+        self.rng = rng or random # anything with choice(), envs pass their own random.Random so episodes replay from a seed
+        self.start_x = start_x
+        self.start_y = start_y
+        self.rows = rows
+        self.cols = cols
+
+        self.col_offsets = np.arange(cols) * float(ENEMY_SPACING)
+        self.row_offsets = np.arange(rows) * float(ENEMY_SPACING)
+        self.col_x = np.zeros(cols)
+        self.row_y = np.zeros(rows)
+        self.alive = np.zeros((rows, cols), dtype=bool)
+
+        self.cells = [[Enemy(self, row, col) for col in range(cols)] for row in range(rows)]
+        self._enemies = None
+        self.version = 0 # bumped whenever the alive mask changes, for caches of anything derived from it
+
+        # frontier index, kept up to date by create_formation and remove_enemy
+        self.count = 0
+        self.row_counts = []
+        self.col_counts = []
+        self.live_cols = [] # sorted, and col_x grows with col, so this is also sorted by x
+        self.column_top = [] # top-most live row of each column, -1 when empty
+        self.column_bottom = [] # bottom-most live row of each column, -1 when empty
+        self.highest_row = -1
+        self.lowest_row = -1
+
+        self.create_formation()
+
+    def create_formation(self, start_x=None, start_y=None):
+        if start_x:
+            self.start_x = start_x
+        if start_y:
+            self.start_y = start_y
+
+        self.col_x[:] = self.start_x + self.col_offsets
+        self.row_y[:] = self.start_y - self.row_offsets
+        self.alive[:] = True
+        self._enemies = None
+        self.version += 1
+
+        self.count = self.rows * self.cols
+        self.row_counts = [self.cols] * self.rows
+        self.col_counts = [self.rows] * self.cols
+        self.live_cols = list(range(self.cols))
+        self.column_top = [0] * self.cols
+        self.column_bottom = [self.rows - 1] * self.cols
+        self.highest_row = 0
+        self.lowest_row = self.rows - 1
+
+    def remove_enemy(self, enemy):
+        row, col = enemy.row, enemy.col
+
+        if not self.alive[row, col]:
+            return
+
+        self.alive[row, col] = False
+        self._enemies = None
+        self.version += 1
+        self.count -= 1
+        self.row_counts[row] -= 1
+        self.col_counts[col] -= 1
+
+        if self.col_counts[col] == 0:
+            del self.live_cols[bisect.bisect_left(self.live_cols, col)]
+            self.column_top[col] = -1
+            self.column_bottom[col] = -1
+        else:
+            while not self.alive[self.column_top[col], col]:
+                self.column_top[col] += 1
+            while not self.alive[self.column_bottom[col], col]:
+                self.column_bottom[col] -= 1
+
+        if self.count == 0:
+            self.highest_row = -1
+            self.lowest_row = -1
+        else:
+            while self.row_counts[self.highest_row] == 0:
+                self.highest_row += 1
+            while self.row_counts[self.lowest_row] == 0:
+                self.lowest_row -= 1
+
+    def get_lowest_enemy(self):
+        # a random column's bottom-most enemy, the one that gets to shoot
+        if not self.live_cols:
+            return None
+
+        col = self.rng.choice(self.live_cols)
+        return self.cells[self.column_bottom[col]][col]
+
+    def nearest_enemy(self, x):
+        # closest enemy by x, ties go to whichever comes first in row-major order like a min() over enemies would
+        if not self.live_cols:
+            return None
+
+        i = bisect.bisect_left(self.live_cols, (x - self.start_x) / ENEMY_SPACING)
+        best = None
+        for col in self.live_cols[max(0, i - 1):i + 1]:
+            key = (abs(float(self.col_x[col]) - x), self.column_top[col], col)
+            if best is None or key < best:
+                best = key
+
+        return self.cells[best[1]][best[2]]
+
+    def enemy_hit_by(self, bullet):
+        # broad phase: enemies are further apart than a bullet is wide, so only the cell nearest to the bullet can be hit
+        if not self.count:
+            return None
+
+        col = int(round((bullet.center_x - float(self.col_x[0])) / ENEMY_SPACING))
+        row = int(round((float(self.row_y[0]) - bullet.center_y) / ENEMY_SPACING))
+
+        if not (0 <= row < self.rows and 0 <= col < self.cols) or not self.alive[row, col]:
+            return None
+
+        enemy = self.cells[row][col]
+        return enemy if bullet.collides_with(enemy) else None
+
+    def lowest_enemy(self):
+        if not self.count:
+            return None
+
+        return self.cells[self.lowest_row][int(np.argmax(self.alive[self.lowest_row]))]
+
+    def highest_enemy(self):
+        if not self.count:
+            return None
+
+        return self.cells[self.highest_row][int(np.argmax(self.alive[self.highest_row]))]
+
+    def move(self, width, height, direction_type, value):
+        half = SHIP_SIZE / 2
+
+        if direction_type == "x":
+            if not self.live_cols:
+                return
+
+            left, right = self.col_x[self.live_cols[0]], self.col_x[self.live_cols[-1]]
+            if right + value + half > width or left + value < half:
+                return
+
+            self.col_x += value
+            self.start_x += value
+        else:
+            if not self.count:
+                return
+
+            top, bottom = self.row_y[self.highest_row], self.row_y[self.lowest_row]
+            if top + value + half > height or bottom + value < half:
+                return
+
+            self.row_y += value
+            self.start_y += value
+
+    def live_x(self):
+        # x of every live enemy in row-major order, same order as enemies
+        return np.broadcast_to(self.col_x, self.alive.shape)[self.alive]
+
+    @property
+    def center_x(self):
+        return self.start_x + (self.cols / 2) * ENEMY_SPACING
+
+    @property
+    def enemies(self):
+        # rebuilt lazily after kills, so several kills in one tick only cost one rebuild
+        if self._enemies is None:
+            self._enemies = [enemy for row in self.cells for enemy in row if self.alive[enemy.row, enemy.col]]
+
+        return self._enemies
+
+class BulletPool():
+    # Hands out released bullets again instead of building one per shot, capacity are made up front. The envs keep it
+    # fixed: a shot fired while every bullet is in flight is dropped and spawn returns None, like SpaceInvadersVecEnv
+    # does with its slots, so the scalar and batched envs stay in step. Game lets it grow, a match never loses a shot.
+    def __init__(self, capacity=BULLET_CAPACITY, grow=False):
+        self.free = [Bullet(0, 0, 0) for _ in range(capacity)]
+        self.grow = grow
+        self.created = capacity
+        self.dropped = 0
+
+        for bullet in self.free:
+            bullet.active = False
+
+    def spawn(self, x, y, direction_y):
+        if not self.free:
+            if not self.grow:
+                self.dropped += 1
+                return None
+
+            self.created += 1
+            return Bullet(x, y, direction_y)
+
+        bullet = self.free.pop()
+        bullet.center_x = x
+        bullet.center_y = y
+        bullet.direction_y = direction_y
+        bullet.active = True
+
+        return bullet
+
+    def release(self, bullet):
+        # releasing twice is a no-op, so a bullet can be dropped from several places in one step
+        if bullet.active:
+            bullet.active = False
+            self.free.append(bullet)
+
+class SpatialHash():
+    # Uniform grid for bodies that don't sit on the formation grid. Keys decide who wins when a bullet touches several bodies.
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def _cell_range(self, x, y, half_width, half_height):
+        size = self.cell_size
+        for cx in range(int((x - half_width) // size), int((x + half_width) // size) + 1):
+            for cy in range(int((y - half_height) // size), int((y + half_height) // size) + 1):
+                yield cx, cy
+
+    def build(self, bodies):
+        self.cells = {}
+        for key, body in enumerate(bodies):
+            self.insert(key, body)
+
+    def insert(self, key, body):
+        for cell in self._cell_range(body.center_x, body.center_y, body.width / 2, body.height / 2):
+            self.cells.setdefault(cell, []).append((key, body))
+
+    def remove(self, key, body):
+        for cell in self._cell_range(body.center_x, body.center_y, body.width / 2, body.height / 2):
+            entries = self.cells.get(cell)
+            if entries:
+                entries.remove((key, body))
+
+    def first_hit(self, bullet):
+        # the colliding body with the lowest key, same as the first hit when testing bodies in key order
+        best = None
+        for cell in self._cell_range(bullet.center_x, bullet.center_y, bullet.width / 2, bullet.height / 2):
+            for key, body in self.cells.get(cell, ()):
+                if (best is None or key < best[0]) and bullet.collides_with(body):
+                    best = (key, body)
+
+        return best
+
+class Player(Body): # Not actually the player
+    def __init__(self, x, y, now=None):
+        super().__init__(x, y)
+
+        # now is the caller's clock, the game passes its simulation time so cooldowns don't depend on frame rate
+        now = time.perf_counter() if now is None else now
+        self.last_target_change = now
+        self.last_shoot = now
+        self.shoot = False
+        self.player_speed = 0
+        self.action = None # the agent's last decision, repeated on ticks it doesn't decide on
+
+    def apply_action(self, action, now=None):
+        self.prev_x = self.center_x
+        if action == 0:
+            self.center_x -= PLAYER_SPEED
+        elif action == 1:
+            self.center_x += PLAYER_SPEED
+        elif action == 2:
+            pass
+        elif action == 3:
+            t = time.perf_counter() if now is None else now
+            if t - self.last_shoot >= PLAYER_ATTACK_SPEED:
+                self.last_shoot = t
+                self.shoot = True
+
+        self.player_speed = (self.center_x - self.prev_x) / max(1e-6, PLAYER_SPEED)
+
+def observe_players(players, enemy_formation, bullets, width, height, player_respawns_norm, enemy_respawns_norm, out=None, now=None):
+    # One observation row per player so the whole fleet goes through the policy in a single batch.
+    # Formation features are shared, so they are only computed once per call.
+    obs = np.zeros((len(players), 12), dtype=np.float32) if out is None else out
+
+    px = np.array([player.center_x for player in players])
+    py = np.array([player.center_y for player in players])
+
+    if enemy_formation.count:
+        for i, player in enumerate(players):
+            nearest = enemy_formation.nearest_enemy(player.center_x)
+            obs[i, 1] = (nearest.center_x - player.center_x) / width
+            obs[i, 2] = (nearest.center_y - player.center_y) / height
+
+        # the game has always fed the top row here, unlike the env's lowest_enemy
+        highest = enemy_formation.highest_enemy()
+        obs[:, 3] = (highest.center_y - py) / float(height)
+
+        obs[:, 8] = float(enemy_formation.live_x().astype(np.float32).std()) / float(width)
+    else:
+        obs[:, 1:4] = 2.0
+        obs[:, 8] = 0.0
+
+    if bullets:
+        bx = np.array([b.center_x for b in bullets])
+        by = np.array([b.center_y for b in bullets])
+
+        nearest = np.argmin(np.abs(bx[None, :] - px[:, None]) + np.abs(by[None, :] - py[:, None]), axis=1)
+        obs[:, 4] = (bx[nearest] - px) / float(width)
+        obs[:, 5] = (by[nearest] - py) / float(height)
+    else:
+        obs[:, 4:6] = 2.0
+
+    now = time.perf_counter() if now is None else now
+
+    obs[:, 0] = px / width
+    obs[:, 6] = [player.player_speed for player in players]
+    obs[:, 7] = enemy_formation.count / float(max(1, enemy_formation.rows * enemy_formation.cols))
+    obs[:, 9] = [now - player.last_shoot >= PLAYER_ATTACK_SPEED for player in players]
+    obs[:, 10] = player_respawns_norm
+    obs[:, 11] = enemy_respawns_norm
+
+    return obs
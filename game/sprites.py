@@ -1,181 +1,126 @@
-import arcade, time, random, numpy as np
-
-from stable_baselines3 import PPO
-
-from utils.constants import PLAYER_SPEED, BULLET_SPEED, BULLET_RADIUS, PLAYER_ATTACK_SPEED
-from utils.preload import player_texture, enemy_texture
-
-class Bullet(arcade.Sprite):
-    def __init__(self, x, y, direction_y):
-        super().__init__(arcade.texture.make_circle_texture(BULLET_RADIUS, arcade.color.YELLOW), center_x=x, center_y=y)
-
-        self.direction_y = direction_y
-
-    def update(self):
-        self.center_y += self.direction_y * BULLET_SPEED
-
-class EnemyFormation():
-    def __init__(self, start_x, start_y, spritelist: arcade.SpriteList | None, rows, cols):
-        self.grid = [[] for _ in range(rows)]
-        self.start_x = start_x
-        self.start_y = start_y
-        self.rows = rows
-        self.cols = cols
-        self.spritelist = spritelist
-
-        self.create_formation()
-
-    def create_formation(self, start_x=None, start_y=None):
-        if start_x:
-            self.start_x = start_x
-        if start_y:
-            self.start_y = start_y
-
-        del self.grid
-        self.grid = [[] for _ in range(self.rows)]
-
-        for row in range(self.rows):
-            for col in range(self.cols):
-                enemy_sprite = arcade.Sprite(enemy_texture, center_x=self.start_x + col * 100, center_y=self.start_y - row * 100)
-                
-                if self.spritelist:
-                    self.spritelist.append(enemy_sprite)
-
-                self.grid[row].append(enemy_sprite)
-
-    def remove_enemy(self, enemy):
-        if self.spritelist and enemy not in self.spritelist:
+import arcade, numpy as np
+
+from utils.preload import player_texture, enemy_texture, bullet_texture
+
+class BodySprite(arcade.Sprite):
+    def __init__(self, texture, body):
+        super().__init__(texture, center_x=body.center_x, center_y=body.center_y)
+
+        self.body = body
+        self.previous = (body.center_x, body.center_y)
+
+    def save_previous(self):
+        self.previous = (self.body.center_x, self.body.center_y)
+
+    def sync(self, alpha=1.0):
+        # alpha blends from the position at the start of the current tick to the body's position now
+        x, y = self.previous
+        self.position = (x + (self.body.center_x - x) * alpha, y + (self.body.center_y - y) * alpha)
+
+class BulletSprite(BodySprite):
+    def __init__(self, bullet):
+        super().__init__(bullet_texture, bullet)
+
+class EnemySprite(BodySprite):
+    def __init__(self, enemy):
+        super().__init__(enemy_texture, enemy)
+
+class PlayerSprite(BodySprite): # Not actually the player
+    def __init__(self, player):
+        super().__init__(player_texture, player)
+
+class SpriteCache():
+    # Keeps sprites of removed bodies around and points them at new bodies, so respawns and new shots don't build sprites.
+    # The textures are shared, so every sprite of a type also shares the same hit box points.
+    def __init__(self):
+        self.free = {}
+        self.created = 0
+
+    def get(self, sprite_class, body):
+        free = self.free.get(sprite_class)
+
+        if free:
+            sprite = free.pop()
+            sprite.body = body
+            sprite.save_previous()
+            sprite.sync()
+            return sprite
+
+        self.created += 1
+        return sprite_class(body)
+
+    def release(self, sprite):
+        self.free.setdefault(type(sprite), []).append(sprite)
+
+class EnemyLayer():
+    # One sprite per formation cell for the whole game, dead enemies are hidden instead of removed so the list never
+    # changes. Enemy bodies are fixed cells of the formation, so positions are interpolated per column and per row and
+    # written as a block, and nothing is touched while the formation stands still.
+    def __init__(self, formation):
+        self.formation = formation
+        self.spritelist = arcade.SpriteList(capacity=formation.rows * formation.cols)
+        self.sprites = [[EnemySprite(enemy) for enemy in row] for row in formation.cells]
+        for row in self.sprites:
+            self.spritelist.extend(row)
+
+        self.previous_x = formation.col_x.copy()
+        self.previous_y = formation.row_y.copy()
+        self.drawn_x = None
+        self.drawn_y = None
+        self.version = None # formation version the visibility was last synced to
+
+    def save_previous(self):
+        self.previous_x[:] = self.formation.col_x
+        self.previous_y[:] = self.formation.row_y
+
+    def sync(self, alpha=1.0):
+        formation = self.formation
+
+        if self.version != formation.version:
+            self.version = formation.version
+            for row, sprites in enumerate(self.sprites):
+                for col, sprite in enumerate(sprites):
+                    sprite.visible = bool(formation.alive[row, col])
+
+        xs = self.previous_x + (formation.col_x - self.previous_x) * alpha
+        ys = self.previous_y + (formation.row_y - self.previous_y) * alpha
+        if self.drawn_x is not None and np.array_equal(xs, self.drawn_x) and np.array_equal(ys, self.drawn_y):
             return
 
-        for row in range(self.rows):
-            for col in range(self.cols):
-                if self.grid[row][col] == enemy:
-                    self.grid[row][col] = None
-                    if self.spritelist:
-                        self.spritelist.remove(enemy)
-                    return 
-    
-    def get_lowest_enemy(self):
-        valid_cols = []
-
-        for col in range(self.cols):
-            row = self.rows - 1
-            
-            while row >= 0 and self.grid[row][col] is None:
-                row -= 1
-
-            if row >= 0:
-                valid_cols.append((col, row))
-
-        if not valid_cols:
-            return None
-
-        col, row = random.choice(valid_cols)
-        return self.grid[row][col]
-
-    def move(self, width, height, direction_type, value):
-        if direction_type == "x":
-            wall_hit = False
-            for enemy in self.enemies:
-                self.start_x += value
-                enemy.center_x += value
-
-                if enemy.center_x + enemy.width / 2 > width or enemy.center_x < enemy.width / 2:
-                    wall_hit = True
-            
-            if wall_hit:
-                for enemy in self.enemies:
-                    self.start_x -= value
-                    enemy.center_x -= value
-        else:
-            wall_hit = False
-            for enemy in self.enemies:
-                self.start_x += value
-                enemy.center_y += value
-
-                if enemy.center_y + enemy.height / 2 > height or enemy.center_y < enemy.height / 2:
-                    wall_hit = True
-            
-            if wall_hit:
-                for enemy in self.enemies:
-                    self.start_y -= value
-                    enemy.center_y -= value
-
-    @property
-    def center_x(self):
-        return self.start_x + (self.cols / 2) * 100
-
-    @property
-    def enemies(self):
-        return [col for row in self.grid for col in row if not col == None]
-
-class Player(arcade.Sprite): # Not actually the player
-    def __init__(self, x, y):
-        super().__init__(player_texture, center_x=x, center_y=y)
-
-        self.last_target_change = time.perf_counter()
-        self.last_shoot = time.perf_counter()
-        self.shoot = False
-        self.player_speed = 0
-
-    def update(self, model: PPO, enemy_formation, bullets, width, height, player_respawns_norm, enemy_respawns_norm):
-        if enemy_formation.enemies:
-            nearest_enemy = min(enemy_formation.enemies, key=lambda e: abs(e.center_x - self.center_x))
-            enemy_x = (nearest_enemy.center_x - self.center_x) / width
-            enemy_y = (nearest_enemy.center_y - self.center_y) / height
-        else:
-            enemy_x = 2
-            enemy_y = 2
-
-        enemy_count = len(enemy_formation.enemies) / float(max(1, enemy_formation.rows * enemy_formation.cols))
-        player_x_norm = self.center_x / width
-
-        curr_bullet = min(bullets, key=lambda b: abs(b.center_x - self.center_x) + abs(b.center_y - self.center_y)) if bullets else None
-        if curr_bullet is not None:
-            curr_bx = (curr_bullet.center_x - self.center_x) / float(width)
-            curr_by = (curr_bullet.center_y - self.center_y) / float(height)
-        else:
-            curr_bx = 2.0
-            curr_by = 2.0
-
-        lowest = max(enemy_formation.enemies, key=lambda e: e.center_y) if enemy_formation.enemies else None
-        if lowest is not None:
-            lowest_dy = (lowest.center_y - self.center_y) / float(height)
-        else:
-            lowest_dy = 2.0
-
-        enemy_dispersion = 0.0
-        if enemy_formation.enemies:
-            xs = np.array([e.center_x for e in enemy_formation.enemies], dtype=np.float32)
-            enemy_dispersion = float(xs.std()) / float(width)
-
-        obs = np.array([
-            player_x_norm, 
-            enemy_x, 
-            enemy_y,
-            lowest_dy,
-            curr_bx, 
-            curr_by,
-            self.player_speed,
-            enemy_count,
-            enemy_dispersion,
-            time.perf_counter() - self.last_shoot >= PLAYER_ATTACK_SPEED,
-            player_respawns_norm, 
-            enemy_respawns_norm
-        ], dtype=np.float32)
-        action, _ = model.predict(obs, deterministic=True)
-
-        self.prev_x = self.center_x
-        if action == 0:
-            self.center_x -= PLAYER_SPEED
-        elif action == 1:
-            self.center_x += PLAYER_SPEED
-        elif action == 2:
-            pass
-        elif action == 3:
-            t = time.perf_counter()
-            if t - self.last_shoot >= PLAYER_ATTACK_SPEED:
-                self.last_shoot = t
-                self.shoot = True
-
-        self.player_speed = (self.center_x - self.prev_x) / max(1e-6, PLAYER_SPEED)
+        self.drawn_x, self.drawn_y = xs, ys
+        xs = xs.tolist()
+        for y, sprites in zip(ys.tolist(), self.sprites):
+            for x, sprite in zip(xs, sprites):
+                sprite.position = (x, y)
+
+# arcade 3 marks each buffer of a sprite list dirty when a sprite changes, and draw() uploads the dirty ones
+UPLOAD_FLAGS = {
+    "position": "_sprite_pos_angle_changed",
+    "size": "_sprite_size_changed",
+    "color": "_sprite_color_changed",
+    "texture": "_sprite_texture_changed",
+    "index": "_sprite_index_changed"
+}
+
+class DrawStats():
+    # Counts the draw calls and buffer uploads of the sprite lists drawn through it
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.frames = 0
+        self.draws = 0
+        self.uploads = {name: 0 for name in UPLOAD_FLAGS}
+
+    def draw(self, spritelist):
+        if len(spritelist) and spritelist.visible:
+            self.draws += 1
+            for name, flag in UPLOAD_FLAGS.items():
+                self.uploads[name] += bool(getattr(spritelist, flag, False))
+
+        spritelist.draw()
+
+    def summary(self):
+        frames = max(1, self.frames)
+        uploads = ", ".join(f"{name} {count / frames:.2f}" for name, count in self.uploads.items())
+        return f"{self.draws / frames:.2f} draw calls and {sum(self.uploads.values()) / frames:.2f} buffer uploads per frame ({uploads}) over {self.frames} frames"
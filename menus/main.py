@@ -2,6 +2,7 @@ import arcade, arcade.gui, asyncio, pypresence, time, copy, json
 from utils.preload import button_texture, button_hovered_texture
 from utils.constants import big_button_style, discord_presence_id
 from utils.utils import FakePyPresence
+from utils.policy import preload_policy, POLICY_BACKENDS
 
 class Main(arcade.gui.UIView):
     def __init__(self, pypresence_client=None):
@@ -15,6 +16,9 @@ class Main(arcade.gui.UIView):
         with open("settings.json", "r") as file:
             self.settings_dict = json.load(file)
 
+        # the agent loads while the user is in the menus, so pressing Play doesn't block on it
+        preload_policy("invader_agent.zip", POLICY_BACKENDS.get(self.settings_dict.get("policy_backend", "NumPy"), "numpy"))
+
         if self.settings_dict.get('discord_rpc', True):
             if self.pypresence_client == None: # Game has started
                 try:
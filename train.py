@@ -1,30 +1,5 @@
-from stable_baselines3 import PPO
-from utils.rl import SpaceInvadersEnv
-from stable_baselines3.common.vec_env import DummyVecEnv
+from utils.training import main
 
-def make_env(rank: int, seed: int = 0):
-    def _init():
-        env = SpaceInvadersEnv()
-        return env
-    return _init
-
-env = SpaceInvadersEnv()
-
-n_envs = 128
-
-env = DummyVecEnv([make_env(i) for i in range(n_envs)])
-model = PPO(
-    "MlpPolicy", 
-    env, 
-    n_steps=8192,
-    batch_size=256,
-    n_epochs=7,
-    learning_rate=0.001,
-    verbose=1, 
-    device="cpu", 
-    gamma=0.985, 
-    ent_coef=0.015,
-    clip_range=0.2,
-)
-model.learn(75_000_000)
-model.save("invader_agent")
\ No newline at end of file
+# Same as python -m utils.training, every MODEL_SETTINGS value has a flag (python train.py --help)
+if __name__ == "__main__":
+    main()
@@ -3,74 +3,13 @@ from arcade.types import Color
 from arcade.gui.widgets.buttons import UITextureButtonStyle, UIFlatButtonStyle
 from arcade.gui.widgets.slider import UISliderStyle
 
-ENEMY_SPEED = 5
-ENEMY_ATTACK_SPEED = 0.75
-
-PLAYER_SPEED = 5 # not actually player
-PLAYER_ATTACK_SPEED = 0.75
-
-BULLET_SPEED = 5
-BULLET_RADIUS = 15
-
-# default, min, max, step
-MODEL_SETTINGS = {
-    "n_steps": [1024, 256, 8192, 256],
-    "batch_size": [128, 16, 512, 16],
-    "n_epochs": [10, 1, 50, 1],
-    "learning_rate": [3e-4, 1e-5, 1e-2, 1e-5],
-    "gamma": [0.99, 0.8, 0.9999, 0.001],
-    "ent_coef": [0.015, 0.0, 0.1, 0.001],
-    "clip_range": [0.2, 0.1, 0.4, 0.01],
-    "learning_steps": [1_000_000, 50_000, 25_000_000, 50_000],
-    "n_envs": (12, 1, 128, 1)
-}
-
-DIFFICULTY_SETTINGS = {
-    "enemy_rows": ["Enemy Rows", 1, 6],
-    "enemy_cols": ["Enemy Columns", 1, 7],
-    "enemy_respawns": ["Enemy Respawns", 1, 5],
-    "player_count": ["Player Count", 1, 10],
-    "player_respawns": ["Player Respawns", 1, 5]
-}
-
-DIFFICULTY_LEVELS = {
-    "Easy": {
-        "enemy_rows": 2,
-        "enemy_cols": 3,
-        "enemy_respawns": 5,
-        "player_count": 2,
-        "player_respawns": 2
-    },
-    "Medium": {
-        "enemy_rows": 3,
-        "enemy_cols": 4,
-        "enemy_respawns": 4,
-        "player_count": 4,
-        "player_respawns": 3
-    },
-    "Hard": {
-        "enemy_rows": 4,
-        "enemy_cols": 5,
-        "enemy_respawns": 3,
-        "player_count": 6,
-        "player_respawns": 4
-    },
-    "Extra Hard": {
-        "enemy_rows": 5,
-        "enemy_cols": 6,
-        "enemy_respawns": 2,
-        "player_count": 8,
-        "player_respawns": 5
-    },
-    "Custom": {
-
-    }
-}
+from utils.game_constants import ENEMY_SPEED, ENEMY_ATTACK_SPEED, PLAYER_SPEED, PLAYER_ATTACK_SPEED, BULLET_SPEED, BULLET_RADIUS, BULLET_CAPACITY, PLAYER_Y, SHIP_SIZE, ENEMY_SPACING, TICK_RATE, MAX_FRAME_TIME, MODEL_SETTINGS, DIFFICULTY_SETTINGS, DIFFICULTY_LEVELS
 
 menu_background_color = (30, 30, 47)
 log_dir = 'logs'
 monitor_log_dir = "training_logs"
 discord_presence_id = 1438214877343907881
+max_update_rate = 480 # on_update calls per second when the FPS limit is off, the game only simulates on its own ticks
 
 button_style = {'normal': UITextureButtonStyle(font_name="Roboto", font_color=arcade.color.BLACK), 'hover': UITextureButtonStyle(font_name="Roboto", font_color=arcade.color.BLACK),
                 'press': UITextureButtonStyle(font_name="Roboto", font_color=arcade.color.BLACK), 'disabled': UITextureButtonStyle(font_name="Roboto", font_color=arcade.color.BLACK)}
@@ -95,6 +34,8 @@ settings = {
     },
     "Miscellaneous": {
         "Discord RPC": {"type": "bool", "config_key": "discord_rpc", "default": True},
+        "Policy Backend": {"type": "option", "options": ["NumPy", "Stable Baselines 3"], "config_key": "policy_backend", "default": "NumPy"},
+        "Record Matches": {"type": "bool", "config_key": "record_matches", "default": False},
     },
     "Credits": {}
 }
@@ -0,0 +1,109 @@
+import numpy as np
+from collections import deque
+
+from stable_baselines3.common.callbacks import BaseCallback
+
+from utils.game_constants import DIFFICULTY_LEVELS
+
+# Mixed-difficulty training in one vec env. Every env slot plays one of the levels, and between rollouts the mix moves
+# toward harder levels once the rolling score on the hardest one unlocked so far (the frontier) crosses promote_at.
+# Slots switch level at their next episode, so neither the vec env nor its worker processes are rebuilt.
+#
+# The score is the win rate, or by default progress: the share of the level's enemies (every respawn included) an
+# episode destroyed, which is 1 for a win. Full wins are rare enough that a win rate alone would rarely move the frontier.
+
+MEASURES = ["progress", "win_rate"]
+
+CURRICULUM = [name for name, level in DIFFICULTY_LEVELS.items() if level] # Easy to Extra Hard, Custom has no settings of its own
+
+class Curriculum():
+    def __init__(self, n_envs, levels=CURRICULUM, window=100, min_episodes=50, measure="progress", promote_at=0.25, review_share=0.2):
+        if measure not in MEASURES:
+            raise ValueError(f"Unknown curriculum measure: {measure}. Available: {MEASURES}")
+
+        self.n_envs = n_envs
+        self.levels = list(levels)
+        self.min_episodes = min_episodes
+        self.measure = measure
+        self.promote_at = promote_at
+        self.review_share = review_share # of the slots, spread over the levels below the frontier so they aren't forgotten
+
+        self.enemy_totals = [DIFFICULTY_LEVELS[name]["enemy_rows"] * DIFFICULTY_LEVELS[name]["enemy_cols"] * (DIFFICULTY_LEVELS[name]["enemy_respawns"] + 1) for name in self.levels]
+        self.frontier = 0
+        self.results = {name: [deque(maxlen=window) for _ in self.levels] for name in MEASURES}
+
+    def record(self, level, won, enemies_killed):
+        self.results["win_rate"][level].append(float(won))
+        self.results["progress"][level].append(min(1.0, enemies_killed / self.enemy_totals[level]))
+
+    def score(self, level, measure=None):
+        results = self.results[measure or self.measure][level]
+        return sum(results) / len(results) if results else 0.0
+
+    def update(self):
+        # True when the frontier moved, one level at a time
+        results = self.results[self.measure][self.frontier]
+        if self.frontier < len(self.levels) - 1 and len(results) >= self.min_episodes and self.score(self.frontier) >= self.promote_at:
+            self.frontier += 1
+            return True
+
+        return False
+
+    def shares(self):
+        shares = np.zeros(len(self.levels))
+
+        if self.frontier == 0:
+            shares[0] = 1.0
+        else:
+            shares[:self.frontier] = self.review_share / self.frontier
+            shares[self.frontier] = 1.0 - self.review_share
+
+        return shares
+
+    def assignment(self):
+        # level of every slot, counts by largest remainder and the slots in level order so a change moves as few as possible
+        exact = self.shares() * self.n_envs
+        counts = np.floor(exact).astype(int)
+        counts[np.argsort(counts - exact)[:self.n_envs - counts.sum()]] += 1
+
+        return np.repeat(np.arange(len(self.levels)), counts)
+
+class CurriculumCallback(BaseCallback):
+    # needs a SpaceInvadersVecEnv or SharedMemoryVecEnv built with levels=curriculum.levels, under any VecEnvWrapper
+    def __init__(self, curriculum, verbose=0):
+        super().__init__(verbose)
+
+        self.curriculum = curriculum
+        self.assigned = None
+
+    def _on_training_start(self):
+        self.assign()
+
+    def _on_step(self):
+        for i in np.flatnonzero(self.locals["dones"]):
+            info = self.locals["infos"][i]
+            self.curriculum.record(info["level"], info["won"], info["enemies_killed"])
+
+        return True
+
+    def _on_rollout_end(self):
+        if self.curriculum.update():
+            self.assign()
+
+            if self.verbose:
+                print(f"Curriculum frontier moved to {self.curriculum.levels[self.curriculum.frontier]}")
+
+        self.logger.record("curriculum/frontier", self.curriculum.frontier)
+        for level, name in enumerate(self.curriculum.levels):
+            for measure in MEASURES:
+                self.logger.record(f"curriculum/{measure}_{name.lower().replace(' ', '_')}", self.curriculum.score(level, measure))
+
+    def assign(self):
+        # only slots whose level changed are sent, one set_attr per level
+        assignment = self.curriculum.assignment()
+        changed = np.arange(len(assignment)) if self.assigned is None else np.flatnonzero(assignment != self.assigned)
+
+        for level in np.unique(assignment[changed]):
+            self.training_env.set_attr("next_level", int(level), indices=changed[assignment[changed] == level].tolist())
+
+        self.assigned = assignment
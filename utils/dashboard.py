@@ -0,0 +1,140 @@
+import os, csv, numpy as np
+
+# Data layer for the live training plots. Log files are tailed from the last byte read, so a refresh only parses new rows,
+# and only the most recent rows are kept in fixed-size ring buffers.
+
+class RingBuffer():
+    def __init__(self, capacity, columns):
+        self.capacity = capacity
+        self.data = np.full((capacity, columns), np.nan)
+        self.size = 0
+        self.head = 0 # next row to write
+
+    def clear(self):
+        self.size = 0
+        self.head = 0
+
+    def extend(self, rows):
+        rows = np.asarray(rows, dtype=np.float64)[-self.capacity:]
+        n = len(rows)
+        if not n:
+            return
+
+        first = min(n, self.capacity - self.head)
+        self.data[self.head:self.head + first] = rows[:first]
+        self.data[:n - first] = rows[first:]
+
+        self.head = (self.head + n) % self.capacity
+        self.size = min(self.capacity, self.size + n)
+
+    def values(self):
+        # oldest to newest
+        if self.size < self.capacity:
+            return self.data[:self.size]
+
+        return np.concatenate((self.data[self.head:], self.data[:self.head]))
+
+class CSVTail():
+    # Follows a CSV that is only ever appended to, except for a full rewrite when the header changes (SB3 does that for new keys).
+    def __init__(self, path, comment="#"):
+        self.path = path
+        self.comment = comment
+        self.columns = None
+        self.header = None
+        self.offset = 0
+
+    def read_new(self):
+        # returns (rows, rewritten), rewritten meaning everything read so far is stale and rows start from the top again
+        try:
+            file = open(self.path, "rb")
+        except FileNotFoundError:
+            return [], False
+
+        with file:
+            rewritten = False
+
+            if self.header is None or os.fstat(file.fileno()).st_size < self.offset or self._read_header(file) != self.header:
+                rewritten = self.header is not None
+                file.seek(0)
+                header = self._read_header(file)
+                if header is None or not header.endswith(b"\n"):
+                    self.header = None
+                    return [], rewritten
+
+                self.header = header
+                self.columns = next(csv.reader([header.decode()]))
+                self.offset = file.tell()
+
+            file.seek(self.offset)
+            data = file.read()
+
+        end = data.rfind(b"\n") + 1 # a half written last line is picked up on the next read
+        self.offset += end
+
+        return [row for row in csv.reader(data[:end].decode().splitlines()) if row], rewritten
+
+    def _read_header(self, file):
+        line = file.readline()
+        while line.startswith(self.comment.encode()):
+            line = file.readline()
+
+        return line or None
+
+def to_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+class TrainingDashboard():
+    progress_columns = ("time/total_timesteps", "rollout/ep_rew_mean", "train/policy_gradient_loss", "train/value_loss", "train/explained_variance")
+
+    def __init__(self, progress_path, episodes, capacity=10_000):
+        # episodes is a Monitor style CSV path, or anything else with read_new() and columns like EpisodeStats.reader()
+        self.progress = CSVTail(progress_path)
+        self.monitor = CSVTail(episodes) if isinstance(episodes, str) else episodes
+
+        self.episodes = RingBuffer(capacity, 2) # total timesteps, episode reward
+        self.losses = RingBuffer(capacity, len(self.progress_columns))
+        self.total_timesteps = 0
+
+    def refresh(self):
+        # True when anything new arrived
+        rows, rewritten = self.monitor.read_new()
+        if rewritten:
+            self.episodes.clear()
+            self.total_timesteps = 0
+
+        if len(rows):
+            r, l = self.monitor.columns.index("r"), self.monitor.columns.index("l")
+            if isinstance(rows, np.ndarray):
+                episodes = rows[:, [l, r]].astype(np.float64)
+            else:
+                episodes = np.array([(to_float(row[l]), to_float(row[r])) for row in rows])
+            episodes[:, 0] = self.total_timesteps + np.cumsum(episodes[:, 0])
+            self.total_timesteps = episodes[-1, 0]
+            self.episodes.extend(episodes)
+
+        new_progress, progress_rewritten = self.progress.read_new()
+        if progress_rewritten:
+            self.losses.clear()
+
+        if new_progress:
+            indices = [self.progress.columns.index(column) if column in self.progress.columns else None for column in self.progress_columns]
+            self.losses.extend([[to_float(row[i]) if i is not None and i < len(row) else np.nan for i in indices] for row in new_progress])
+
+        return bool(len(rows) or new_progress or rewritten or progress_rewritten)
+
+    def episode_rewards(self, window=10):
+        # (timesteps, rolling mean reward), NaN until a full window is in like pandas' rolling().mean()
+        episodes = self.episodes.values()
+        rolling = np.full(len(episodes), np.nan)
+
+        if len(episodes) >= window:
+            sums = np.cumsum(np.concatenate(([0.0], episodes[:, 1])))
+            rolling[window - 1:] = (sums[window:] - sums[:-window]) / window
+
+        return episodes[:, 0], rolling
+
+    def progress_column(self, column):
+        return self.losses.values()[:, self.progress_columns.index(column)]
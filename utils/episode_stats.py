@@ -0,0 +1,125 @@
+import json, threading, time, numpy as np
+
+from stable_baselines3.common.vec_env import VecEnvWrapper
+
+# Episode statistics for a whole vec env, instead of a Monitor and a CSV per env. Finished episodes go into one columnar
+# ring buffer. They are appended to a single file a batch at a time, either every flush_every episodes or after
+# flush_interval seconds, whichever comes first. The file keeps Monitor's layout, a # JSON line and then r, l, t first, so
+# CSVTail and SB3's load_results can read it. Readers in the same process, like the dashboard, take rows straight from
+# memory through reader().
+#
+# Respawns are the ones left when the episode ended. Columns the env doesn't report are -1.
+
+COLUMNS = ("r", "l", "t", "kills", "player_respawns", "enemy_respawns", "level", "won")
+INFO_COLUMNS = {"kills": "enemies_killed", "player_respawns": "player_respawns_remaining", "enemy_respawns": "enemy_respawns_remaining", "level": "level", "won": "won"}
+FORMATS = ("%.6f", "%d", "%.6f", "%d", "%d", "%d", "%d", "%d")
+
+class EpisodeStats(VecEnvWrapper):
+    def __init__(self, venv, filename=None, flush_every=256, flush_interval=10.0, history=10_000):
+        super().__init__(venv)
+
+        self.t_start = time.time()
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.history = max(history, flush_every) # unflushed rows must still be in the ring
+
+        self.returns = np.zeros(self.num_envs)
+        self.lengths = np.zeros(self.num_envs, dtype=np.int64)
+
+        self.data = np.zeros((len(COLUMNS), self.history)) # one row per column, so every stat is contiguous
+        self.episodes = 0 # ever recorded, the ring holds the last history of them
+        self.flushed = 0
+        self.last_flush = time.perf_counter()
+        self.lock = threading.Lock() # reader() can be polled from another thread
+
+        self.file = None
+        if filename is not None:
+            self.file = open(filename, "w")
+            self.file.write("#" + json.dumps({"t_start": self.t_start, "env_id": None}) + "\n")
+            self.file.write(",".join(COLUMNS) + "\n")
+            self.file.flush()
+
+    def reset(self):
+        self.returns[:] = 0.0
+        self.lengths[:] = 0
+        return self.venv.reset()
+
+    def step_wait(self):
+        obs, rewards, dones, infos = self.venv.step_wait()
+        self.returns += rewards
+        self.lengths += 1
+
+        done_idx = np.flatnonzero(dones)
+        if len(done_idx):
+            self._record(done_idx, infos)
+            self.returns[done_idx] = 0.0
+            self.lengths[done_idx] = 0
+
+        if self.file is not None and self.episodes > self.flushed and (self.episodes - self.flushed >= self.flush_every or time.perf_counter() - self.last_flush >= self.flush_interval):
+            self.flush()
+
+        return obs, rewards, dones, infos
+
+    def _record(self, done_idx, infos):
+        n = len(done_idx)
+        t = round(time.time() - self.t_start, 6)
+        rows = np.empty((len(COLUMNS), n))
+        rows[0] = self.returns[done_idx]
+        rows[1] = self.lengths[done_idx]
+        rows[2] = t
+
+        for column, key in INFO_COLUMNS.items():
+            rows[COLUMNS.index(column)] = [infos[i].get(key, -1) for i in done_idx]
+
+        # SB3 fills rollout/ep_rew_mean and ep_len_mean from these, like it does for Monitor
+        for j, i in enumerate(done_idx):
+            infos[i]["episode"] = {"r": round(float(rows[0, j]), 6), "l": int(rows[1, j]), "t": t}
+
+        with self.lock:
+            slots = (self.episodes + np.arange(n)) % self.history
+            self.data[:, slots] = rows
+            self.episodes += n
+
+    def rows(self, start, end):
+        # episodes start to end (counted from the first) as (episodes, columns), the caller holds the lock
+        slots = np.arange(start, end) % self.history
+        return self.data[:, slots].T
+
+    def flush(self):
+        with self.lock:
+            start = max(self.flushed, self.episodes - self.history)
+            rows = self.rows(start, self.episodes)
+            self.flushed = self.episodes
+
+        np.savetxt(self.file, rows, fmt=FORMATS, delimiter=",")
+        self.file.flush()
+        self.last_flush = time.perf_counter()
+
+    def reader(self):
+        return EpisodeReader(self)
+
+    def close(self):
+        if self.file is not None:
+            if self.episodes > self.flushed:
+                self.flush()
+            self.file.close()
+            self.file = None
+
+        return self.venv.close()
+
+class EpisodeReader():
+    # Same read_new() as CSVTail, with float rows, for following an EpisodeStats from memory.
+    # A reader that falls more than history episodes behind skips the oldest ones.
+    columns = list(COLUMNS)
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.seen = 0
+
+    def read_new(self):
+        with self.stats.lock:
+            end = self.stats.episodes
+            rows = self.stats.rows(max(self.seen, end - self.stats.history), end)
+
+        self.seen = end
+        return rows, False
@@ -0,0 +1,167 @@
+import argparse, json, math, os, multiprocessing as mp, numpy as np
+
+from utils.rl import SpaceInvadersEnv
+from utils.vec_env import SpaceInvadersVecEnv
+from utils.policy import NumpyPolicy, load_policy, export_path
+from utils.game_constants import DIFFICULTY_LEVELS
+
+# Scores trained agents over many seeded episodes per difficulty, split over a process pool.
+# Each worker steps a batch of envs in lockstep so the policy runs once per step for the whole batch.
+# Run from the repo root with python -m utils.evaluation invader_agent.zip [more checkpoints]
+
+DIFFICULTIES = [name for name, level in DIFFICULTY_LEVELS.items() if level] # Custom has no settings of its own
+
+def evaluate_seeds(npz_path, difficulty, seeds, batch_size):
+    # one episode per seed on SpaceInvadersEnv, so any episode can be re-run on its own from its seed
+    policy = NumpyPolicy(npz_path)
+    queue = list(seeds)[::-1]
+    envs, obs, active = [], [], []
+
+    for _ in range(min(batch_size, len(queue))):
+        env = SpaceInvadersEnv(difficulty=difficulty, frame_skip=policy.frame_skip)
+        obs.append(env.reset(seed=queue.pop())[0])
+        envs.append(env)
+        active.append(True)
+
+    obs = np.array(obs, dtype=np.float32)
+    results = []
+    rewards = np.zeros(len(envs))
+
+    while any(active):
+        actions, _ = policy.predict(obs, deterministic=True)
+
+        for i, env in enumerate(envs):
+            if not active[i]:
+                continue
+
+            obs[i], reward, terminated, truncated, info = env.step(int(actions[i]))
+            rewards[i] += reward
+
+            if terminated or truncated:
+                results.append((terminated and not env.enemy_formation.count, info["enemies_killed"], info["step"], rewards[i]))
+                rewards[i] = 0.0
+
+                if queue:
+                    obs[i] = env.reset(seed=queue.pop())[0]
+                else:
+                    active[i] = False
+
+    return results
+
+def evaluate_vec(npz_path, difficulty, episodes, seed, batch_size):
+    # the batched NumPy env, much faster but only reproducible per worker seed. Every slot plays the same number of
+    # episodes, so short episodes aren't over-represented
+    policy = NumpyPolicy(npz_path)
+    n_envs = min(batch_size, episodes)
+    quota = np.full(n_envs, episodes // n_envs) + (np.arange(n_envs) < episodes % n_envs)
+
+    env = SpaceInvadersVecEnv(n_envs, difficulty=difficulty, seed=seed, frame_skip=policy.frame_skip)
+    obs = env.reset()
+    rewards = np.zeros(n_envs)
+    results = []
+
+    while quota.any():
+        actions, _ = policy.predict(obs, deterministic=True)
+        obs, reward, dones, infos = env.step(actions)
+        rewards += reward
+
+        for i in np.flatnonzero(dones):
+            if quota[i]:
+                quota[i] -= 1
+                results.append((infos[i]["won"], infos[i]["enemies_killed"], infos[i]["step"], rewards[i]))
+            rewards[i] = 0.0
+
+    env.close()
+    return results
+
+def mean_interval(values, z=1.96):
+    values = np.asarray(values, dtype=np.float64)
+    half = z * values.std(ddof=1) / math.sqrt(len(values)) if len(values) > 1 else float("nan")
+    return float(values.mean()), half
+
+def wilson_interval(wins, n, z=1.96):
+    # stays inside [0, 1] and behaves at 0 or n wins, unlike mean +- z * stderr
+    if n == 0:
+        return float("nan"), float("nan")
+
+    p = wins / n
+    centre = (p + z * z / (2 * n)) / (1 + z * z / n)
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+
+    return max(0.0, centre - half), min(1.0, centre + half) # rounding can land a hair outside at 0 or n wins
+
+def summarize(results):
+    won, kills, steps, rewards = (np.array(column) for column in zip(*results))
+    low, high = wilson_interval(int(won.sum()), len(won))
+
+    return {
+        "episodes": len(results),
+        "win_rate": float(won.mean()),
+        "win_rate_ci": [low, high],
+        "kills": mean_interval(kills),
+        "survival_steps": mean_interval(steps),
+        "reward": mean_interval(rewards)
+    }
+
+def evaluate(model_paths, difficulties=DIFFICULTIES, episodes=1000, seed=0, workers=None, batch_size=None, backend="env"):
+    workers = workers or os.cpu_count() or 1
+    batch_size = batch_size or (256 if backend == "vec" else 32)
+    # exports happen here, before any worker could race on writing the same .npz
+    npz_paths = {}
+    for path in model_paths:
+        load_policy(path)
+        npz_paths[path] = export_path(path)
+
+    jobs = []
+    for path in model_paths:
+        for difficulty in difficulties:
+            if backend == "vec":
+                # a chunk per worker, each with its own seed
+                counts = np.diff(np.linspace(0, episodes, min(workers, episodes) + 1).astype(int))
+                jobs += [((path, difficulty), evaluate_vec, (npz_paths[path], difficulty, int(count), seed + i, batch_size)) for i, count in enumerate(counts) if count]
+            else:
+                # the same seeds for every checkpoint and difficulty, so comparisons between them are paired
+                seeds = list(range(seed, seed + episodes))
+                chunk = max(1, math.ceil(episodes / (workers * 4)))
+                jobs += [((path, difficulty), evaluate_seeds, (npz_paths[path], difficulty, seeds[i:i + chunk], batch_size)) for i in range(0, episodes, chunk)]
+
+    # the platform's default start method, workers only get the .npz path and load the policy themselves, so nothing the
+    # export imported here (torch with it) has to carry over into them
+    ctx = mp.get_context()
+    with ctx.Pool(workers) as pool:
+        pending = [(key, pool.apply_async(function, args)) for key, function, args in jobs]
+        collected = {}
+        for key, result in pending:
+            collected.setdefault(key, []).extend(result.get())
+
+    return {path: {difficulty: summarize(collected[(path, difficulty)]) for difficulty in difficulties} for path in model_paths}
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate trained agents over seeded episodes on every difficulty")
+    parser.add_argument("models", nargs="*", default=["invader_agent.zip"])
+    parser.add_argument("--difficulties", nargs="+", default=DIFFICULTIES, choices=DIFFICULTIES)
+    parser.add_argument("--episodes", type=int, default=1000, help="per model and difficulty")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=None, help="envs stepped together per worker, 32 for env and 256 for vec by default")
+    parser.add_argument("--backend", choices=["env", "vec"], default="env", help="vec is faster, but episodes can't be re-run from a seed")
+    parser.add_argument("--json", default=None, help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = evaluate(args.models, args.difficulties, args.episodes, args.seed, args.workers, args.batch_size, args.backend)
+
+    for path, by_difficulty in report.items():
+        print(path)
+        for difficulty, stats in by_difficulty.items():
+            low, high = stats["win_rate_ci"]
+            print(f"    {difficulty:>10}: win {100 * stats['win_rate']:5.1f}% [{100 * low:5.1f}, {100 * high:5.1f}]  "
+                  f"kills {stats['kills'][0]:6.2f} +- {stats['kills'][1]:.2f}  "
+                  f"survival {stats['survival_steps'][0]:7.1f} +- {stats['survival_steps'][1]:.1f} steps  "
+                  f"reward {stats['reward'][0]:8.2f} +- {stats['reward'][1]:.2f}  ({stats['episodes']} episodes)")
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=4)
+
+if __name__ == "__main__":
+    main()
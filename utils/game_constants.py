@@ -0,0 +1,79 @@
+# Gameplay constants, kept free of arcade so the simulation and training can import them without a window
+
+ENEMY_SPEED = 5
+ENEMY_ATTACK_SPEED = 0.75
+
+PLAYER_SPEED = 5 # not actually player
+PLAYER_ATTACK_SPEED = 0.75
+
+BULLET_SPEED = 5
+BULLET_RADIUS = 15
+BULLET_CAPACITY = 64 # bullets per training env, shots past it are dropped. Game sizes its own pool from the window
+
+PLAYER_Y = 100
+SHIP_SIZE = 64 # player.png and enemy.png are both 64x64
+ENEMY_SPACING = 100
+
+# The speeds above are per simulation tick, and the agent was trained on one env step per tick, so this stays fixed
+# whatever the frame rate. MAX_FRAME_TIME stops a long stall from being caught up all at once.
+TICK_RATE = 60
+MAX_FRAME_TIME = 0.25
+
+# default, min, max, step
+MODEL_SETTINGS = {
+    "n_steps": [1024, 256, 8192, 256],
+    "batch_size": [128, 16, 512, 16],
+    "n_epochs": [10, 1, 50, 1],
+    "learning_rate": [3e-4, 1e-5, 1e-2, 1e-5],
+    "gamma": [0.99, 0.8, 0.9999, 0.001],
+    "ent_coef": [0.015, 0.0, 0.1, 0.001],
+    "clip_range": [0.2, 0.1, 0.4, 0.01],
+    "learning_steps": [1_000_000, 50_000, 25_000_000, 50_000],
+    "n_envs": (12, 1, 128, 1),
+    "frame_skip": (1, 1, 8, 1), # ticks each agent decision is repeated for
+    "n_workers": (0, 0, 32, 1), # 0 steps the envs inside the training process
+    "pin_workers": (0, 0, 1, 1),
+    "curriculum": (0, 0, 1, 1) # 1 starts every env on Easy and moves them toward Extra Hard as the agent starts winning
+}
+
+DIFFICULTY_SETTINGS = {
+    "enemy_rows": ["Enemy Rows", 1, 6],
+    "enemy_cols": ["Enemy Columns", 1, 7],
+    "enemy_respawns": ["Enemy Respawns", 1, 5],
+    "player_count": ["Player Count", 1, 10],
+    "player_respawns": ["Player Respawns", 1, 5]
+}
+
+DIFFICULTY_LEVELS = {
+    "Easy": {
+        "enemy_rows": 2,
+        "enemy_cols": 3,
+        "enemy_respawns": 5,
+        "player_count": 2,
+        "player_respawns": 2
+    },
+    "Medium": {
+        "enemy_rows": 3,
+        "enemy_cols": 4,
+        "enemy_respawns": 4,
+        "player_count": 4,
+        "player_respawns": 3
+    },
+    "Hard": {
+        "enemy_rows": 4,
+        "enemy_cols": 5,
+        "enemy_respawns": 3,
+        "player_count": 6,
+        "player_respawns": 4
+    },
+    "Extra Hard": {
+        "enemy_rows": 5,
+        "enemy_cols": 6,
+        "enemy_respawns": 2,
+        "player_count": 8,
+        "player_respawns": 5
+    },
+    "Custom": {
+
+    }
+}
@@ -0,0 +1,168 @@
+import os, sys, threading, hashlib, numpy as np
+
+# The game only needs the actor half of the trained MlpPolicy, so it's exported to a plain .npz and run with NumPy.
+# Stable Baselines 3 (and torch with it) is only imported to export, or when the sb3 backend is asked for.
+
+ACTIVATIONS = {
+    "Tanh": np.tanh,
+    "ReLU": lambda x: np.maximum(x, 0.0),
+    "Identity": lambda x: x
+}
+
+POLICY_BACKENDS = {"NumPy": "numpy", "Stable Baselines 3": "sb3"} # Policy Backend setting -> load_policy backend
+
+def export_path(model_path):
+    return os.path.splitext(model_path)[0] + ".npz"
+
+def model_digest(model_path):
+    # the export remembers which model it came from by content, a fresh clone or checkout writes files in no set order
+    with open(model_path, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+def export_policy(model_path="invader_agent.zip", out_path=None):
+    from stable_baselines3 import PPO
+
+    model = PPO.load(model_path, device="cpu")
+    policy = model.policy
+    activation = policy.activation_fn.__name__
+
+    if activation not in ACTIVATIONS:
+        raise ValueError(f"Unsupported activation for export: {activation}")
+
+    layers = [layer for layer in policy.mlp_extractor.policy_net if hasattr(layer, "weight")] + [policy.action_net]
+
+    # frame_skip is set on the model by training, the game repeats each decision for that many ticks like the env did
+    arrays = {"activation": np.array(activation), "n_layers": np.array(len(layers)), "frame_skip": np.array(getattr(model, "frame_skip", 1)),
+              "source": np.array(model_digest(model_path))}
+    for i, layer in enumerate(layers):
+        arrays[f"w{i}"] = layer.weight.detach().cpu().numpy().astype(np.float32)
+        arrays[f"b{i}"] = layer.bias.detach().cpu().numpy().astype(np.float32)
+
+    out_path = out_path or export_path(model_path)
+    np.savez(out_path, **arrays)
+
+    return out_path
+
+class NumpyPolicy():
+    # Same predict() signature as an SB3 model, deterministic actions are the argmax of the action logits.
+    def __init__(self, path):
+        with np.load(path) as data:
+            self.activation = ACTIVATIONS[str(data["activation"])]
+            n_layers = int(data["n_layers"])
+            # transposed once here so a forward pass is just obs @ w + b per layer
+            self.weights = [np.ascontiguousarray(data[f"w{i}"].T) for i in range(n_layers)]
+            self.biases = [data[f"b{i}"] for i in range(n_layers)]
+            self.frame_skip = int(data["frame_skip"]) if "frame_skip" in data.files else 1
+
+        self.rng = np.random.default_rng()
+
+    def logits(self, obs):
+        x = np.asarray(obs, dtype=np.float32)
+
+        for w, b in zip(self.weights[:-1], self.biases[:-1]):
+            x = self.activation(x @ w + b)
+
+        return x @ self.weights[-1] + self.biases[-1]
+
+    def predict(self, obs, state=None, episode_start=None, deterministic=False):
+        obs = np.asarray(obs, dtype=np.float32)
+        logits = self.logits(obs.reshape(-1, obs.shape[-1]))
+
+        if deterministic:
+            actions = logits.argmax(axis=1)
+        else:
+            probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+            probs /= probs.sum(axis=1, keepdims=True)
+            actions = (probs.cumsum(axis=1) > self.rng.random((len(probs), 1))).argmax(axis=1)
+
+        return (actions if obs.ndim > 1 else actions[0]), state
+
+def load_policy(model_path="invader_agent.zip", backend="numpy"):
+    if backend == "sb3":
+        from stable_baselines3 import PPO
+        return PPO.load(model_path, device="cpu")
+
+    path = export_path(model_path)
+    stale = not os.path.exists(path)
+    if not stale and os.path.exists(model_path):
+        with np.load(path) as data:
+            stale = "source" not in data.files or str(data["source"]) != model_digest(model_path)
+
+    if stale:
+        export_policy(model_path, path) # first run after training, pays for the SB3 import once
+
+    return NumpyPolicy(path)
+
+def model_identity(model_path):
+    # what cached policies are keyed on, so rematches reuse the loaded policy but a retrained file is picked up
+    path = model_path if os.path.exists(model_path) else export_path(model_path)
+    stat = os.stat(path)
+
+    return stat.st_mtime_ns, stat.st_size
+
+class PolicyLoad():
+    # Loads a policy on a daemon thread, so the menus stay responsive while the agent for the next match loads.
+    def __init__(self, model_path, backend, identity):
+        self.identity = identity
+        self.policy = None
+        self.error = None
+        self.done = threading.Event()
+
+        threading.Thread(target=self.load, args=(model_path, backend), daemon=True).start()
+
+    def load(self, model_path, backend):
+        try:
+            self.policy = load_policy(model_path, backend)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done.set()
+
+    def failed(self):
+        return self.done.is_set() and self.error is not None
+
+    def result(self):
+        self.done.wait()
+
+        if self.error is not None:
+            raise self.error
+
+        return self.policy
+
+policy_cache = {} # (absolute model path, backend) -> PolicyLoad
+policy_cache_lock = threading.Lock()
+
+def cached_load(model_path, backend):
+    identity = model_identity(model_path)
+    key = (os.path.abspath(model_path), backend)
+
+    with policy_cache_lock:
+        entry = policy_cache.get(key)
+        if entry is None or entry.identity != identity or entry.failed():
+            entry = policy_cache[key] = PolicyLoad(model_path, backend, identity)
+
+    return entry
+
+def preload_policy(model_path="invader_agent.zip", backend="numpy"):
+    # starts loading in the background unless the cache already has this version of the file
+    try:
+        cached_load(model_path, backend)
+    except FileNotFoundError:
+        pass
+
+def get_policy(model_path="invader_agent.zip", backend="numpy"):
+    # the cached policy, waiting for it if it's still loading, loaded again only when the file changed
+    return cached_load(model_path, backend).result()
+
+def refresh_policies(model_path="invader_agent.zip"):
+    # after training wrote a new model, reload it for every backend that had it cached
+    path = os.path.abspath(model_path)
+
+    with policy_cache_lock:
+        backends = [backend for cached_path, backend in policy_cache if cached_path == path]
+
+    for backend in backends:
+        preload_policy(model_path, backend)
+
+if __name__ == "__main__":
+    print(f"Exported to {export_policy(*sys.argv[1:2])}")
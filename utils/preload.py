@@ -1,5 +1,7 @@
 import arcade.gui, arcade, os
 
+from utils.constants import BULLET_RADIUS
+
 # Get the directory where this module is located
 _module_dir = os.path.dirname(os.path.abspath(__file__))
 _assets_dir = os.path.join(os.path.dirname(_module_dir), 'assets')
@@ -8,4 +10,7 @@ button_texture = arcade.gui.NinePatchTexture(64 // 4, 64 // 4, 64 // 4, 64 // 4,
 button_hovered_texture = arcade.gui.NinePatchTexture(64 // 4, 64 // 4, 64 // 4, 64 // 4, arcade.load_texture(os.path.join(_assets_dir, 'graphics', 'button_hovered.png')))
 
 enemy_texture = arcade.load_texture(os.path.join(_assets_dir, 'graphics', 'enemy.png'))
-player_texture = arcade.load_texture(os.path.join(_assets_dir, 'graphics', 'player.png'))
\ No newline at end of file
+player_texture = arcade.load_texture(os.path.join(_assets_dir, 'graphics', 'player.png'))
+
+# Shared by every bullet, so shooting never makes a new image, atlas entry or hit box
+bullet_texture = arcade.texture.make_circle_texture(BULLET_RADIUS, arcade.color.YELLOW)
@@ -0,0 +1,53 @@
+import time
+
+# Opt-in per-phase timing for env steps. Envs keep a PhaseTimer only while profiling is on and skip every lap otherwise,
+# so leaving the hooks in costs one None check per phase.
+
+class PhaseTimer():
+    def __init__(self):
+        self.seconds = {}
+        self.calls = {}
+        self.last = 0.0
+
+    def start(self):
+        self.last = time.perf_counter()
+
+    def lap(self, phase):
+        # time since start() or the previous lap goes to phase
+        now = time.perf_counter()
+        self.seconds[phase] = self.seconds.get(phase, 0.0) + now - self.last
+        self.calls[phase] = self.calls.get(phase, 0) + 1
+        self.last = now
+
+    def stats(self):
+        return {phase: {"seconds": seconds, "calls": self.calls[phase]} for phase, seconds in self.seconds.items()}
+
+    def reset(self):
+        self.seconds.clear()
+        self.calls.clear()
+
+def merge_phase_times(stats_list):
+    merged = {}
+
+    for stats in stats_list:
+        for phase, values in stats.items():
+            total = merged.setdefault(phase, {"seconds": 0.0, "calls": 0})
+            total["seconds"] += values["seconds"]
+            total["calls"] += values["calls"]
+
+    return merged
+
+def vec_phase_times(venv, reset=False):
+    # aggregate over every env of a vec env. Batched envs hand the same stats to each of their indices, so those count once
+    results = venv.env_method("get_phase_times", reset=reset)
+    return merge_phase_times({id(stats): stats for stats in results}.values())
+
+def format_phase_times(stats):
+    total = sum(values["seconds"] for values in stats.values()) or 1.0
+    lines = []
+
+    for phase, values in sorted(stats.items(), key=lambda item: item[1]["seconds"], reverse=True):
+        mean_us = 1e6 * values["seconds"] / max(1, values["calls"])
+        lines.append(f"{phase:>12}: {values['seconds']:9.3f} s {100 * values['seconds'] / total:5.1f}% {values['calls']:>10} calls {mean_us:9.2f} us/call")
+
+    return "\n".join(lines)
@@ -0,0 +1,127 @@
+import argparse, os, random
+import gymnasium as gym
+
+from utils.rl import SpaceInvadersEnv
+from utils.replay_file import Replay # the file format, see utils/replay_file.py
+
+# An episode is replayed from its seed, the env settings and the action stream, with a state checksum every few steps
+# to catch replays that drift (a changed sim, a different Python). A 2000 step episode is well under a kilobyte.
+
+class ReplayRecorder(gym.Wrapper):
+    # Records every episode of a SpaceInvadersEnv. Resets without a seed get one from the recorder's own RNG,
+    # so each recorded episode can be replayed on its own.
+    def __init__(self, env, directory=None, checksum_interval=100, seed=None, prefix="episode"):
+        super().__init__(env)
+
+        self.directory = directory
+        self.checksum_interval = checksum_interval
+        self.prefix = prefix
+        self.seeds = random.Random(seed)
+        self.replay = None
+        self.episodes = 0
+        self.last_replay = None
+
+    def reset(self, seed=None, options=None):
+        seed = self.seeds.getrandbits(32) if seed is None else seed
+        obs, info = self.env.reset(seed=seed, options=options)
+        self.replay = Replay(seed, self.env.unwrapped.replay_settings(), self.checksum_interval)
+
+        return obs, info
+
+    def step(self, action):
+        obs, reward, terminated, truncated, info = self.env.step(action)
+
+        self.replay.actions.append(int(action))
+        if len(self.replay.actions) % self.checksum_interval == 0:
+            self.replay.checksums.append(self.env.unwrapped.state_checksum())
+
+        if terminated or truncated:
+            self.finish()
+
+        return obs, reward, terminated, truncated, info
+
+    def finish(self):
+        self.last_replay = self.replay
+        self.episodes += 1
+
+        if self.directory is not None:
+            self.replay.save(os.path.join(self.directory, f"{self.prefix}_{self.episodes:06d}.fcrp"))
+
+class ReplayPlayer():
+    # Re-simulates a replay one step at a time, checking the recorded checksums on the way.
+    def __init__(self, replay):
+        self.replay = replay
+        self.env = SpaceInvadersEnv(**replay.settings)
+        self.env.reset(seed=replay.seed)
+
+        self.step_index = 0
+        self.reward = 0.0
+        self.terminated = False
+        self.truncated = False
+        self.diverged_at = None
+
+    def done(self):
+        return self.step_index >= len(self.replay.actions)
+
+    def step(self):
+        _, reward, self.terminated, self.truncated, _ = self.env.step(self.replay.actions[self.step_index])
+        self.step_index += 1
+        self.reward += reward
+
+        interval = self.replay.checksum_interval
+        if self.step_index % interval == 0 and self.diverged_at is None:
+            index = self.step_index // interval - 1
+            if index < len(self.replay.checksums) and self.replay.checksums[index] != self.env.state_checksum():
+                self.diverged_at = self.step_index
+
+    def result(self):
+        return {
+            "steps": self.step_index,
+            "reward": self.reward,
+            "enemies_killed": self.env.enemies_killed,
+            "terminated": self.terminated,
+            "truncated": self.truncated,
+            "won": self.terminated and not self.env.enemy_formation.count,
+            "diverged_at": self.diverged_at
+        }
+
+def play_replay(replay):
+    # headless, as fast as the env steps
+    player = ReplayPlayer(replay)
+    while not player.done():
+        player.step()
+
+    return player.result()
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-simulate recorded episodes headless, or watch them")
+    parser.add_argument("replays", nargs="+")
+    parser.add_argument("--render", action="store_true", help="watch the replays in a window instead")
+    parser.add_argument("--speed", type=int, default=1, help="steps per frame when rendering")
+    args = parser.parse_args()
+
+    replays = [Replay.load(path) for path in args.replays]
+
+    if args.render:
+        from game.replay import watch_replays, watch_match
+        if any(replay.kind == "game" for replay in replays):
+            if len(replays) > 1:
+                raise SystemExit("Recorded matches are watched one at a time")
+            watch_match(replays[0])
+        else:
+            watch_replays(replays, args.speed)
+        return
+
+    for path, replay in zip(args.replays, replays):
+        if replay.kind == "game":
+            # Game needs a window, so matches are only re-simulated while watching them
+            print(f"{path}: recorded match, {len(replay.actions)} inputs, watch it with --render")
+            continue
+
+        result = play_replay(replay)
+        print(f"{path}: {result['steps']} steps, reward {result['reward']:.2f}, {result['enemies_killed']} kills, "
+              f"{'won' if result['won'] else 'lost' if result['terminated'] else 'timed out'}"
+              f"{'' if result['diverged_at'] is None else ', DIVERGED at step ' + str(result['diverged_at'])}")
+
+if __name__ == "__main__":
+    main()
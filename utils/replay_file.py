@@ -0,0 +1,72 @@
+import json, struct, zlib, numpy as np
+
+# The FCRP replay file, kept apart from utils.replay so Game can record matches without importing the env and gymnasium.
+#
+# File layout, little endian:
+#   b"FCRP", u8 version, u32 header length, JSON header (seed, settings, checksum interval, step count, kind),
+#   u32 length, zlib compressed actions packed 2 bits each, u32 length, uint32 checksums
+#
+# kind is "env" for SpaceInvadersEnv episodes and "game" for Game matches, whose symbols are the per tick inputs
+# described in game/play.py. Files from before kind was added are env episodes.
+
+MAGIC = b"FCRP"
+VERSION = 1
+
+def pack_actions(actions):
+    # four Discrete(4) actions per byte, first action in the low bits
+    padded = np.zeros(-(-len(actions) // 4) * 4, dtype=np.uint8)
+    padded[:len(actions)] = np.frombuffer(bytes(actions), dtype=np.uint8)
+    quads = padded.reshape(-1, 4)
+
+    return (quads[:, 0] | quads[:, 1] << 2 | quads[:, 2] << 4 | quads[:, 3] << 6).tobytes()
+
+def unpack_actions(data, steps):
+    packed = np.frombuffer(data, dtype=np.uint8)
+    return (packed[:, None] >> np.array([0, 2, 4, 6], dtype=np.uint8) & 3).astype(np.uint8).ravel()[:steps].tobytes()
+
+class Replay():
+    def __init__(self, seed, settings, checksum_interval=100, actions=None, checksums=None, kind="env"):
+        self.seed = seed
+        self.settings = settings
+        self.kind = kind
+        self.checksum_interval = checksum_interval
+        self.actions = bytearray(actions or b"")
+        self.checksums = list(checksums or [])
+
+    def to_bytes(self):
+        header = json.dumps({"seed": self.seed, "settings": self.settings, "checksum_interval": self.checksum_interval, "steps": len(self.actions), "kind": self.kind}).encode()
+        actions = zlib.compress(pack_actions(self.actions), 9)
+        checksums = np.array(self.checksums, dtype="<u4").tobytes()
+
+        return b"".join((MAGIC, struct.pack("<BI", VERSION, len(header)), header, struct.pack("<I", len(actions)), actions, struct.pack("<I", len(checksums)), checksums))
+
+    @staticmethod
+    def from_bytes(data):
+        if data[:4] != MAGIC:
+            raise ValueError("Not a replay file")
+
+        version, header_length = struct.unpack_from("<BI", data, 4)
+        if version != VERSION:
+            raise ValueError(f"Unsupported replay version: {version}")
+
+        offset = 9
+        header = json.loads(data[offset:offset + header_length])
+        offset += header_length
+
+        (length,) = struct.unpack_from("<I", data, offset)
+        actions = unpack_actions(zlib.decompress(data[offset + 4:offset + 4 + length]), header["steps"])
+        offset += 4 + length
+
+        (length,) = struct.unpack_from("<I", data, offset)
+        checksums = np.frombuffer(data[offset + 4:offset + 4 + length], dtype="<u4").tolist()
+
+        return Replay(header["seed"], header["settings"], header["checksum_interval"], actions, checksums, header.get("kind", "env"))
+
+    def save(self, path):
+        with open(path, "wb") as file:
+            file.write(self.to_bytes())
+
+    @staticmethod
+    def load(path):
+        with open(path, "rb") as file:
+            return Replay.from_bytes(file.read())
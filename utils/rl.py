@@ -1,15 +1,18 @@
 import gymnasium as gym
 import numpy as np
-import arcade
-import random
+import random, zlib
 
-from game.sprites import EnemyFormation, Player, Bullet
-from utils.constants import PLAYER_SPEED, BULLET_SPEED, ENEMY_SPEED, DIFFICULTY_LEVELS
+from game.simulation import EnemyFormation, Player, BulletPool
+from utils.game_constants import PLAYER_SPEED, BULLET_SPEED, ENEMY_SPEED, PLAYER_Y, DIFFICULTY_LEVELS
+from utils.profiling import PhaseTimer
 
 class SpaceInvadersEnv(gym.Env):
-    def __init__(self, width=800, height=600, difficulty="Hard"):
+    def __init__(self, width=800, height=600, difficulty="Hard", profile=False, frame_skip=1):
         self.width = width
         self.height = height
+        self.difficulty = difficulty
+        self.frame_skip = frame_skip # ticks each action is repeated for, max_steps still counts ticks
+        self.rng = random.Random() # all of the env's randomness, so a seed and the actions are enough to replay an episode
         
         self.action_space = gym.spaces.Discrete(4)
         self.observation_space = gym.spaces.Box(low=-2.0, high=2.0, shape=(12,), dtype=np.float32)
@@ -20,6 +23,7 @@ class SpaceInvadersEnv(gym.Env):
         self.difficulty_settings = DIFFICULTY_LEVELS[difficulty]
 
         self.bullets = []
+        self.bullet_pool = BulletPool()
         self.player = None
         self.enemy_formation = None
         self.player_speed = 0.0
@@ -36,13 +40,30 @@ class SpaceInvadersEnv(gym.Env):
         self.player_attack_cooldown_steps = 5 
         self.current_cooldown = 0
 
+        # observation state, the denominators never change and the rest is only refreshed when its inputs do
+        self.obs_buffer = np.zeros(12, dtype=np.float32)
+        self.enemy_bullets = []
+        self.enemy_total = float(max(1, self.difficulty_settings["enemy_rows"] * self.difficulty_settings["enemy_cols"]))
+        self.player_respawns_total = float(max(1, self.player_respawns))
+        self.enemy_respawns_total = float(max(1, self.enemy_respawns))
+        self.dispersion_key = None
+        self.dispersion = 0.0
+
+        self.phase_timer = PhaseTimer()
+        self.timer = self.phase_timer if profile else None # step() only times phases while this is set
+
     def reset(self, seed=None, options=None):
         if seed is not None:
             np.random.seed(seed)
-            random.seed(seed)
+            self.rng.seed(seed)
+
+        for b in self.bullets:
+            self.bullet_pool.release(b)
 
         self.bullets = []
-        self.player = Player(self.width / 2 + random.randint(int(-self.width / 3), int(self.width / 3)), 100)
+        self.enemy_bullets = []
+        self.dispersion_key = None
+        self.player = Player(self.width / 2 + self.rng.randint(int(-self.width / 3), int(self.width / 3)), PLAYER_Y)
         self.player_speed = 0.0
         self.current_step = 0
         self.enemies_killed = 0
@@ -54,89 +75,92 @@ class SpaceInvadersEnv(gym.Env):
         start_x = self.width * 0.15
         start_y = self.height * 0.9
         
-        self.enemy_formation = EnemyFormation(start_x, start_y, None, 
+        self.enemy_formation = EnemyFormation(start_x, start_y,
                                               self.difficulty_settings["enemy_rows"], 
-                                              self.difficulty_settings["enemy_cols"])
+                                              self.difficulty_settings["enemy_cols"],
+                                              rng=self.rng)
         
         return self._obs(), {}
 
     def _nearest_enemy(self):
-        if not self.enemy_formation.enemies:
-            return None
-        
-        return min(self.enemy_formation.enemies, key=lambda e: abs(e.center_x - self.player.center_x))
+        return self.enemy_formation.nearest_enemy(self.player.center_x)
 
     def _lowest_enemy(self):
-        if not self.enemy_formation.enemies:
-            return None
-        
-        return min(self.enemy_formation.enemies, key=lambda e: e.center_y)
+        return self.enemy_formation.lowest_enemy()
 
     def _nearest_enemy_bullet(self):
-        enemy_bullets = [b for b in self.bullets if b.direction_y == -1]
-        
-        if not enemy_bullets:
-            return None
-        
-        return min(enemy_bullets, key=lambda b: abs(b.center_x - self.player.center_x) + abs(b.center_y - self.player.center_y))
+        # first of the closest, like min() over the bullets in the order they were fired
+        px, py = self.player.center_x, self.player.center_y
+        nearest, best = None, None
+
+        for b in self.enemy_bullets:
+            d = abs(b.center_x - px) + abs(b.center_y - py)
+            if best is None or d < best:
+                nearest, best = b, d
+
+        return nearest
+
+    def _enemy_dispersion(self):
+        # float32 std depends on the exact x values and their order, so it's cached on the formation state instead of kept as running sums
+        formation = self.enemy_formation
+        key = (formation.version, formation.col_x.tobytes())
+
+        if key != self.dispersion_key:
+            self.dispersion_key = key
+            self.dispersion = float(formation.live_x().astype(np.float32).std()) / float(self.width) if formation.count else 0.0
+
+        return self.dispersion
 
     def _obs(self):
-        if self.enemy_formation.enemies and self.player_alive:
-            nearest = self._nearest_enemy()
-            enemy_x = (nearest.center_x - self.player.center_x) / float(self.width)
-            enemy_y = (nearest.center_y - self.player.center_y) / float(self.height)
-        else:
-            enemy_x = 2.0
-            enemy_y = 2.0
+        obs = self.obs_buffer
+        formation = self.enemy_formation
+        player = self.player
 
-        lowest = self._lowest_enemy()
-        if lowest is not None and self.player_alive:
-            lowest_dy = (lowest.center_y - self.player.center_y) / float(self.height)
-        else:
-            lowest_dy = 2.0
+        if self.player_alive:
+            px, py = player.center_x, player.center_y
 
-        nb = self._nearest_enemy_bullet()
-        if nb is not None and self.player_alive:
-            bx = (nb.center_x - self.player.center_x) / float(self.width)
-            by = (nb.center_y - self.player.center_y) / float(self.height)
+            if formation.count:
+                nearest = formation.nearest_enemy(px)
+                obs[1] = (nearest.center_x - px) / float(self.width)
+                obs[2] = (nearest.center_y - py) / float(self.height)
+
+                lowest = formation.lowest_enemy()
+                obs[3] = (lowest.center_y - py) / float(self.height)
+            else:
+                obs[1:4] = 2.0
+
+            nb = self._nearest_enemy_bullet()
+            if nb is not None:
+                obs[4] = (nb.center_x - px) / float(self.width)
+                obs[5] = (nb.center_y - py) / float(self.height)
+            else:
+                obs[4:6] = 2.0
+
+            obs[0] = px / float(self.width)
+            obs[9] = 1.0 if self.current_cooldown <= 0 else 0.0
         else:
-            bx = 2.0
-            by = 2.0
+            obs[0] = 0.5
+            obs[1:6] = 2.0
+            obs[9] = 0.0
 
-        enemy_count = len(self.enemy_formation.enemies) / float(max(1, self.difficulty_settings["enemy_rows"] * self.difficulty_settings["enemy_cols"]))
-        player_x_norm = self.player.center_x / float(self.width) if self.player_alive else 0.5
-        
-        enemy_dispersion = 0.0
-        if self.enemy_formation.enemies:
-            xs = np.array([e.center_x for e in self.enemy_formation.enemies], dtype=np.float32)
-            enemy_dispersion = float(xs.std()) / float(self.width)
-        
-        can_shoot = 1.0 if (self.player_alive and self.current_cooldown <= 0) else 0.0
-        
-        player_respawns_norm = self.player_respawns_remaining / float(max(1, self.player_respawns))
-        enemy_respawns_norm = self.enemy_respawns_remaining / float(max(1, self.enemy_respawns))
-
-        obs = np.array([
-            player_x_norm, 
-            enemy_x, 
-            enemy_y, 
-            lowest_dy, 
-            bx, 
-            by, 
-            self.player_speed, 
-            enemy_count, 
-            enemy_dispersion,
-            can_shoot,
-            player_respawns_norm,
-            enemy_respawns_norm
-        ], dtype=np.float32)
-        
-        return obs
+        obs[6] = self.player_speed
+        obs[7] = formation.count / self.enemy_total
+        obs[8] = self._enemy_dispersion()
+        obs[10] = self.player_respawns_remaining / self.player_respawns_total
+        obs[11] = self.enemy_respawns_remaining / self.enemy_respawns_total
+
+        # the buffer is reused, but DummyVecEnv keeps the last one as terminal_observation across reset()
+        return obs.copy()
 
     def _respawn_player(self):
-        self.player = Player(self.width / 2 + random.randint(int(-self.width / 3), int(self.width / 3)), 100)
+        self.player = Player(self.width / 2 + self.rng.randint(int(-self.width / 3), int(self.width / 3)), PLAYER_Y)
         self.player_alive = True
+
+        for b in self.enemy_bullets:
+            self.bullet_pool.release(b)
+
         self.bullets = [b for b in self.bullets if b.direction_y == 1]
+        self.enemy_bullets = []
         self.current_cooldown = 0
 
     def _respawn_enemies(self):
@@ -144,7 +168,59 @@ class SpaceInvadersEnv(gym.Env):
         self.enemy_formation.start_y = self.height * 0.9
         self.enemy_formation.create_formation()
 
+    def replay_settings(self):
+        # constructor arguments that, with the seed, reproduce this env
+        return {"width": self.width, "height": self.height, "difficulty": self.difficulty, "frame_skip": self.frame_skip}
+
+    def state_checksum(self):
+        formation = self.enemy_formation
+        scalars = np.array([self.player.center_x, self.player_alive, self.current_cooldown, self.current_step, self.enemies_killed,
+                            self.player_respawns_remaining, self.enemy_respawns_remaining, formation.start_x, formation.start_y], dtype=np.float64)
+        bullets = np.array([(b.center_x, b.center_y, b.direction_y) for b in self.bullets], dtype=np.float64)
+
+        return zlib.crc32(b"".join((scalars.tobytes(), formation.col_x.tobytes(), formation.row_y.tobytes(), formation.alive.tobytes(), bullets.tobytes())))
+
+    def enable_profiling(self, enabled=True):
+        self.timer = self.phase_timer if enabled else None
+
+    def get_phase_times(self, reset=False):
+        stats = self.phase_timer.stats()
+        if reset:
+            self.phase_timer.reset()
+
+        return stats
+
     def step(self, action):
+        timer = self.timer
+        if timer:
+            timer.start()
+
+        # the action repeats for frame_skip ticks, stopping at the tick the episode ends, and only the last tick is observed
+        reward = 0.0
+        for _ in range(self.frame_skip):
+            tick_reward, terminated, truncated = self._tick(action, timer)
+            reward += tick_reward
+
+            if terminated or truncated:
+                break
+
+        obs = self._obs()
+
+        info = {
+            "enemies_killed": self.enemies_killed,
+            "step": self.current_step,
+            "player_respawns_remaining": self.player_respawns_remaining,
+            "enemy_respawns_remaining": self.enemy_respawns_remaining
+        }
+
+        if timer:
+            timer.lap("observe")
+            if terminated or truncated:
+                info["phase_times"] = timer.stats()
+        
+        return obs, float(reward), bool(terminated), bool(truncated), info
+
+    def _tick(self, action, timer):
         reward = 0.0
         terminated = False
         truncated = False
@@ -169,12 +245,13 @@ class SpaceInvadersEnv(gym.Env):
                 if self.current_cooldown <= 0:
                     self.current_cooldown = self.player_attack_cooldown_steps
                     reward += 0.01
-                    b = Bullet(self.player.center_x, self.player.center_y, 1)
-                    self.bullets.append(b)
+                    b = self.bullet_pool.spawn(self.player.center_x, self.player.center_y, 1)
+                    if b is not None: # dropped when the pool is empty, the shot still counts for the cooldown
+                        self.bullets.append(b)
                 else:
                     reward -= 0.02
 
-            if self.enemy_formation.enemies:
+            if self.enemy_formation.count:
                 nearest = self._nearest_enemy()
                 alignment = abs(nearest.center_x - self.player.center_x) / self.width
                 if alignment < 0.025:
@@ -183,39 +260,49 @@ class SpaceInvadersEnv(gym.Env):
             self.player.center_x = np.clip(self.player.center_x, 0, self.width)
             self.player_speed = (self.player.center_x - prev_x) / max(1e-6, PLAYER_SPEED)
 
-        if self.enemy_formation.enemies and self.player_alive:
+        if timer:
+            timer.lap("player")
+
+        if self.enemy_formation.count and self.player_alive:
             if self.enemy_formation.center_x < self.player.center_x:
                 self.enemy_formation.move(self.width, self.height, "x", self.enemy_move_speed)
             elif self.enemy_formation.center_x > self.player.center_x:
                 self.enemy_formation.move(self.width, self.height, "x", -self.enemy_move_speed)
             
-            if random.random() < 0.02:
-                if random.random() < 0.5:
+            if self.rng.random() < 0.02:
+                if self.rng.random() < 0.5:
                     self.enemy_formation.move(self.width, self.height, "y", -self.enemy_move_speed)
                 else:
                     self.enemy_formation.move(self.width, self.height, "y", self.enemy_move_speed)
 
-        bullets_to_remove = []
+        if timer:
+            timer.lap("formation")
+
+        # Removed bullets go back to the pool as they're hit, and the lists are compacted once afterwards, keeping their order.
+        # A respawn mid-loop swaps in new lists, but the rest of this loop still runs over the old one.
+        removed = False
 
         for b in self.bullets:
             b.center_y += b.direction_y * BULLET_SPEED
             
             if b.center_y > self.height or b.center_y < 0:
-                bullets_to_remove.append(b)
+                self.bullet_pool.release(b)
+                removed = True
                 continue
             
             if b.direction_y == 1:
-                for e in self.enemy_formation.enemies:
-                    if arcade.check_for_collision(b, e):
-                        self.enemy_formation.remove_enemy(e)
-                        bullets_to_remove.append(b)
-                        reward += 10.0
-                        self.enemies_killed += 1
-                        break
+                e = self.enemy_formation.enemy_hit_by(b)
+                if e is not None:
+                    self.enemy_formation.remove_enemy(e)
+                    self.bullet_pool.release(b)
+                    removed = True
+                    reward += 10.0
+                    self.enemies_killed += 1
             
             elif b.direction_y == -1 and self.player_alive:
-                if arcade.check_for_collision(b, self.player):
-                    bullets_to_remove.append(b)
+                if b.collides_with(self.player):
+                    self.bullet_pool.release(b)
+                    removed = True
                     reward -= 10.0
                     self.player_alive = False
                     
@@ -225,9 +312,12 @@ class SpaceInvadersEnv(gym.Env):
                     else:
                         terminated = True
 
-        for b in bullets_to_remove:
-            if b in self.bullets:
-                self.bullets.remove(b)
+        if removed:
+            self.bullets = [b for b in self.bullets if b.active]
+            self.enemy_bullets = [b for b in self.enemy_bullets if b.active]
+
+        if timer:
+            timer.lap("bullets")
         
         if self.player_alive:
             lowest_enemy = self._lowest_enemy()
@@ -241,7 +331,7 @@ class SpaceInvadersEnv(gym.Env):
                 else:
                     terminated = True
 
-        if not self.enemy_formation.enemies:
+        if not self.enemy_formation.count:
             reward += 50.0
             
             if self.enemy_respawns_remaining > 0:
@@ -252,12 +342,20 @@ class SpaceInvadersEnv(gym.Env):
                 reward += 100.0
                 terminated = True
 
-        shooting_prob = 0.05 + (0.05 * (1.0 - len(self.enemy_formation.enemies) / (self.difficulty_settings["enemy_rows"] * self.difficulty_settings["enemy_cols"])))
-        if self.enemy_formation.enemies and random.random() < shooting_prob:
+        if timer:
+            timer.lap("deaths")
+
+        shooting_prob = 0.05 + (0.05 * (1.0 - self.enemy_formation.count / (self.difficulty_settings["enemy_rows"] * self.difficulty_settings["enemy_cols"])))
+        if self.enemy_formation.count and self.rng.random() < shooting_prob:
             enemy = self.enemy_formation.get_lowest_enemy()
             if enemy:
-                b = Bullet(enemy.center_x, enemy.center_y, -1)
-                self.bullets.append(b)
+                b = self.bullet_pool.spawn(enemy.center_x, enemy.center_y, -1)
+                if b is not None:
+                    self.bullets.append(b)
+                    self.enemy_bullets.append(b)
+
+        if timer:
+            timer.lap("enemy_fire")
 
         if self.player_alive:
             edge_threshold = self.width * 0.1
@@ -266,11 +364,7 @@ class SpaceInvadersEnv(gym.Env):
 
         reward -= 0.01
 
-        obs = self._obs()
-        
-        return obs, float(reward), bool(terminated), bool(truncated), {
-            "enemies_killed": self.enemies_killed,
-            "step": self.current_step,
-            "player_respawns_remaining": self.player_respawns_remaining,
-            "enemy_respawns_remaining": self.enemy_respawns_remaining
-        }
\ No newline at end of file
+        if timer:
+            timer.lap("reward")
+
+        return reward, terminated, truncated
\ No newline at end of file
@@ -0,0 +1,169 @@
+import argparse, datetime, json, math, os, shutil, time, random, multiprocessing as mp
+
+from utils.game_constants import MODEL_SETTINGS, DIFFICULTY_LEVELS
+
+# Hyperparameter sweep with successive halving. Configurations are sampled from the MODEL_SETTINGS slider ranges and
+# trained side by side in worker processes. At every budget checkpoint (rung) each run is scored on the same evaluation
+# seeds, and only the best 1/eta carry on, resuming from their checkpoint with eta times the budget.
+# Run from the repo root with python -m utils.sweep
+
+SWEEP_KEYS = ["n_steps", "batch_size", "n_epochs", "learning_rate", "gamma", "ent_coef", "clip_range"]
+LOG_SCALE = {"learning_rate"} # sampled log-uniformly, the range spans three orders of magnitude
+DIFFICULTIES = [name for name, level in DIFFICULTY_LEVELS.items() if level] # Custom has no settings of its own
+
+def sample_config(rng, keys=SWEEP_KEYS):
+    # the other settings keep their defaults, values land on the same steps as the TrainModel sliders
+    config = {key: data[0] for key, data in MODEL_SETTINGS.items()}
+
+    for key in keys:
+        default, low, high, step = MODEL_SETTINGS[key]
+
+        if key in LOG_SCALE:
+            value = math.exp(rng.uniform(math.log(low), math.log(high)))
+        else:
+            value = rng.uniform(low, high)
+
+        value = min(high, low + round((value - low) / step) * step)
+        config[key] = int(round(value)) if isinstance(default, int) else round(float(value), 10)
+
+    return config
+
+def train_run(run_id, config, target_steps, directory, difficulty, eval_episodes, seed):
+    # Trains one run up to target_steps, continuing from its checkpoint if it has one, then scores it.
+    # Workers share the machine, so torch gets one thread each instead of one per core in every worker.
+    import torch
+    torch.set_num_threads(1)
+
+    from stable_baselines3 import PPO
+    from utils.vec_env import make_vec_env
+    from utils.training import make_model
+    from utils.policy import export_policy
+    from utils.evaluation import evaluate_vec, summarize
+
+    path = os.path.join(directory, f"run_{run_id:03d}.zip")
+    start = time.perf_counter()
+
+    try:
+        env = make_vec_env(int(config["n_envs"]), difficulty=difficulty, seed=seed + run_id, frame_skip=int(config["frame_skip"]))
+
+        try:
+            if os.path.exists(path):
+                model = PPO.load(path, env=env, device="cpu")
+            else:
+                model = make_model(config, env, seed + run_id)
+
+            model.learn(max(0, target_steps - model.num_timesteps), reset_num_timesteps=False)
+            model.save(path)
+            steps = model.num_timesteps
+        finally:
+            env.close()
+
+        # every run is scored on the same seeds, so the ranking compares them on the same episodes
+        stats = summarize(evaluate_vec(export_policy(path), difficulty, eval_episodes, seed, 64))
+    except Exception as e:
+        return {"run": run_id, "steps": None, "score": None, "evaluation": None, "seconds": time.perf_counter() - start, "error": f"{type(e).__name__}: {e}"}
+
+    return {"run": run_id, "steps": steps, "score": stats["reward"][0], "evaluation": stats, "seconds": time.perf_counter() - start, "error": None}
+
+def rung_budgets(min_steps, max_steps, eta):
+    budgets = []
+    budget = min_steps
+    while budget < max_steps:
+        budgets.append(int(budget))
+        budget *= eta
+
+    budgets.append(int(max_steps))
+    return budgets
+
+def successive_halving(configs, budgets, eta, workers, directory, difficulty, eval_episodes, seed):
+    runs = {run_id: {"run": run_id, "config": config, "rung": -1, "steps": 0, "score": None, "history": [], "error": None} for run_id, config in enumerate(configs)}
+    alive = list(runs)
+
+    # spawn, since torch isn't safe to fork once it has started its thread pools
+    with mp.get_context("spawn").Pool(workers) as pool:
+        for rung, budget in enumerate(budgets):
+            pending = [pool.apply_async(train_run, (run_id, configs[run_id], budget, directory, difficulty, eval_episodes, seed)) for run_id in alive]
+
+            for result in (job.get() for job in pending):
+                run = runs[result["run"]]
+                run["rung"] = rung
+                run["error"] = result["error"]
+
+                if result["error"] is None:
+                    run["steps"] = result["steps"]
+                    run["score"] = result["score"]
+                    run["evaluation"] = result["evaluation"]
+                    run["history"].append([result["steps"], result["score"]])
+                else:
+                    run["score"] = None
+
+            ranked = sorted((run_id for run_id in alive if runs[run_id]["score"] is not None), key=lambda run_id: runs[run_id]["score"], reverse=True)
+            failed = len(alive) - len(ranked)
+            alive = ranked[:max(1, len(ranked) // eta)] if rung < len(budgets) - 1 else ranked
+
+            message = f"rung {rung}: {budget} steps, best {runs[ranked[0]]['score']:.2f} (run {ranked[0]})" if ranked else f"rung {rung}: every run failed"
+            if failed:
+                message += f", {failed} failed"
+            if rung < len(budgets) - 1:
+                message += f", {len(alive)} continue"
+            print(message)
+
+            if not alive:
+                break
+
+    # furthest rung first, then by score within it
+    return sorted(runs.values(), key=lambda run: (run["rung"], run["score"] is not None, run["score"] or 0.0), reverse=True)
+
+def format_table(ranked, keys):
+    header = f"{'rank':>4} {'run':>4} {'rung':>4} {'steps':>10} {'score':>9}  " + " ".join(f"{key:>13}" for key in keys)
+    lines = [header]
+
+    for rank, run in enumerate(ranked, 1):
+        score = "failed" if run["score"] is None else f"{run['score']:.2f}"
+        values = " ".join(f"{run['config'][key]:>13.6g}" for key in keys)
+        lines.append(f"{rank:>4} {run['run']:>4} {run['rung']:>4} {run['steps']:>10} {score:>9}  {values}")
+
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Sample PPO settings from MODEL_SETTINGS and tune them with successive halving")
+    parser.add_argument("--configs", type=int, default=16, help="configurations sampled for the first rung")
+    parser.add_argument("--min-steps", type=int, default=250_000, help="budget of the first rung")
+    parser.add_argument("--max-steps", type=int, default=2_000_000, help="budget of the last rung")
+    parser.add_argument("--eta", type=int, default=2, help="1/eta of the runs survive each rung, and the budget grows eta times")
+    parser.add_argument("--keys", nargs="+", default=SWEEP_KEYS, choices=list(MODEL_SETTINGS), help="settings to sample, the rest keep their defaults")
+    parser.add_argument("--difficulty", default="Hard", choices=DIFFICULTIES)
+    parser.add_argument("--eval-episodes", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=None, help="runs trained at once, one per core by default")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output-dir", default=None, help="checkpoints and results.json, sweeps/<timestamp> by default")
+    parser.add_argument("--best", default="sweep_best.zip", help="where the best checkpoint is copied, exported next to it")
+    args = parser.parse_args()
+
+    directory = args.output_dir or os.path.join("sweeps", datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S"))
+    os.makedirs(directory, exist_ok=True)
+
+    rng = random.Random(args.seed)
+    configs = [sample_config(rng, args.keys) for _ in range(args.configs)]
+    budgets = rung_budgets(args.min_steps, args.max_steps, args.eta)
+    workers = args.workers or os.cpu_count() or 1
+
+    print(f"{args.configs} configurations, rungs at {budgets} steps, {workers} workers, checkpoints in {directory}")
+    ranked = successive_halving(configs, budgets, args.eta, workers, directory, args.difficulty, args.eval_episodes, args.seed)
+
+    print(format_table(ranked, args.keys))
+
+    with open(os.path.join(directory, "results.json"), "w") as file:
+        json.dump({"budgets": budgets, "eta": args.eta, "difficulty": args.difficulty, "seed": args.seed, "runs": ranked}, file, indent=4)
+
+    best = ranked[0]
+    if best["score"] is None:
+        raise SystemExit("Every run failed, see results.json for the errors")
+
+    from utils.policy import export_policy
+    shutil.copyfile(os.path.join(directory, f"run_{best['run']:03d}.zip"), args.best)
+    export_policy(args.best)
+    print(f"Best run {best['run']} scored {best['score']:.2f} after {best['steps']} steps, copied to {args.best}")
+
+if __name__ == "__main__":
+    main()
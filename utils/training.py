@@ -0,0 +1,169 @@
+import argparse, os, shutil, time, multiprocessing as mp, numpy as np
+
+from stable_baselines3 import PPO
+from stable_baselines3.common.callbacks import BaseCallback
+from stable_baselines3.common.logger import configure
+
+from utils.game_constants import MODEL_SETTINGS
+from utils.vec_env import make_vec_env
+from utils.episode_stats import EpisodeStats, COLUMNS
+from utils.curriculum import Curriculum, CurriculumCallback, CURRICULUM
+from utils.policy import export_policy
+
+# Trains the PPO agent from MODEL_SETTINGS style settings, for the TrainModel menu (in a child process, see
+# utils/training_process.py) and from the command line:
+#   python -m utils.training --n-envs 128 --n-workers 8 --pin-workers 1 --n-steps 8192 --batch-size 256 --n-epochs 7 --learning-rate 0.001 --gamma 0.985 --learning-steps 75000000
+
+def fit_batch_size(n_steps, n_envs, batch_size):
+    # so the rollout splits into whole minibatches
+    total_steps_per_rollout = n_steps * max(1, n_envs)
+    if total_steps_per_rollout % batch_size != 0:
+        batch_size = max(64, total_steps_per_rollout // max(1, total_steps_per_rollout // batch_size))
+
+    return batch_size
+
+def make_model(settings, env, seed=None, verbose=0):
+    n_steps = int(settings["n_steps"])
+    batch_size = fit_batch_size(n_steps, int(settings["n_envs"]), int(settings["batch_size"]))
+    if verbose and batch_size != int(settings["batch_size"]):
+        print(f"Warning: Adjusting batch size to {batch_size} for {int(settings['n_envs'])} envs.")
+
+    model = PPO(
+        "MlpPolicy",
+        env,
+        n_steps=n_steps,
+        batch_size=batch_size,
+        n_epochs=int(settings["n_epochs"]),
+        learning_rate=float(settings["learning_rate"]),
+        verbose=verbose,
+        device="cpu",
+        gamma=float(settings["gamma"]),
+        ent_coef=float(settings["ent_coef"]),
+        clip_range=float(settings["clip_range"]),
+        seed=seed
+    )
+    model.frame_skip = int(settings["frame_skip"]) # saved with the model, so the export and the game know it
+
+    return model
+
+class ProgressCallback(BaseCallback):
+    # Sends progress at most every interval seconds: text, metrics and the episodes finished since the last send.
+    # Stops learn() once cancel is set, or when the process that started training is gone.
+    def __init__(self, progress, cancel, total_timesteps, interval=0.5):
+        super().__init__()
+
+        self.progress = progress
+        self.cancel = cancel
+        self.total_timesteps = total_timesteps
+        self.interval = interval
+        self.cancelled = False
+
+        self.episodes = None
+        self.start = None
+        self.last_send = 0.0
+
+    def _on_training_start(self):
+        self.episodes = self.training_env.reader() if isinstance(self.training_env, EpisodeStats) else None
+        self.start = time.perf_counter()
+
+    def _on_step(self):
+        if self.cancel is not None and self.cancel.is_set():
+            self.cancelled = True
+            return False
+
+        if time.perf_counter() - self.last_send >= self.interval:
+            self.send()
+
+            parent = mp.parent_process()
+            if parent is not None and not parent.is_alive():
+                self.cancelled = True
+                return False
+
+        return True
+
+    def _on_training_end(self):
+        self.send()
+
+    def send(self):
+        self.last_send = time.perf_counter()
+        if self.progress is None:
+            return
+
+        steps = self.num_timesteps
+        fps = steps / max(1e-9, self.last_send - self.start)
+        rewards = [episode["r"] for episode in self.model.ep_info_buffer]
+        mean_reward = float(np.mean(rewards)) if rewards else float("nan")
+
+        text = f"Training: {steps:,} / {self.total_timesteps:,} steps ({100 * steps / self.total_timesteps:.0f}%)\n{fps:,.0f} steps/s"
+        if rewards:
+            text += f"\nMean episode reward: {mean_reward:.2f}"
+
+        message = {"status": "running", "text": text, "metrics": {"timesteps": steps, "fps": fps, "ep_rew_mean": mean_reward}}
+        if self.episodes is not None:
+            rows, _ = self.episodes.read_new()
+            if len(rows):
+                message["episodes"] = rows
+                message["columns"] = list(COLUMNS)
+
+        self.progress.put(message)
+
+def train(settings, model_path="invader_agent.zip", log_dir=None, progress=None, cancel=None, seed=None, verbose=1):
+    # Returns "finished" once the model is saved and exported, or "cancelled" when cancel was set, which saves nothing.
+    # progress gets dicts through put(), cancel is anything with is_set(). log_dir gets progress.csv and episodes.monitor.csv.
+    settings = {**{key: data[0] for key, data in MODEL_SETTINGS.items()}, **settings}
+
+    if log_dir is not None:
+        if os.path.exists(log_dir):
+            shutil.rmtree(log_dir)
+        os.makedirs(log_dir)
+
+    n_envs = int(settings["n_envs"])
+    curriculum = bool(settings["curriculum"])
+    env_kwargs = {"difficulty": CURRICULUM[0], "levels": CURRICULUM} if curriculum else {}
+    env = EpisodeStats(make_vec_env(n_envs, n_workers=int(settings["n_workers"]), cpu_affinity=bool(settings["pin_workers"]), seed=seed, frame_skip=int(settings["frame_skip"]), **env_kwargs),
+                       filename=os.path.join(log_dir, "episodes.monitor.csv") if log_dir is not None else None)
+
+    try:
+        model = make_model(settings, env, seed, verbose)
+        if log_dir is not None:
+            model.set_logger(configure(folder=log_dir, format_strings=["stdout", "csv"] if verbose else ["csv"]))
+
+        learning_steps = int(settings["learning_steps"])
+        progress_callback = ProgressCallback(progress, cancel, learning_steps)
+        callbacks = [progress_callback]
+        if curriculum:
+            callbacks.append(CurriculumCallback(Curriculum(n_envs), verbose=verbose))
+
+        model.learn(learning_steps, callback=callbacks)
+
+        if progress_callback.cancelled:
+            return "cancelled"
+
+        model.save(model_path)
+        export_policy(model_path)
+    finally:
+        env.close()
+
+    return "finished"
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the PPO agent, every MODEL_SETTINGS value can be set with a flag")
+    for key, (default, low, high, step) in MODEL_SETTINGS.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=type(default), default=default, help=f"{low} to {high} in the menu, {default} by default")
+    parser.add_argument("--output", default="invader_agent.zip", help="saved here and exported next to it")
+    parser.add_argument("--log-dir", default=None, help="also write progress.csv and episodes.monitor.csv here, the directory is cleared first")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    settings = {key: getattr(args, key) for key in MODEL_SETTINGS}
+    start = time.perf_counter()
+
+    try:
+        train(settings, args.output, args.log_dir, seed=args.seed)
+    except KeyboardInterrupt:
+        raise SystemExit("Training interrupted, nothing was saved")
+
+    print(f"Saved {args.output} after {time.perf_counter() - start:.0f} s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import atexit, queue, traceback, multiprocessing as mp, numpy as np
+
+# Runs utils.training.train in a child process, so PPO's Python-heavy rollouts don't share a GIL with the window and
+# training runs as fast as it does from the command line. The child sends progress through a queue at most every half
+# second. poll() merges everything waiting into one state, the newest text and metrics win, and episode rows pile up
+# until the dashboard reads them with read_new(), the same interface as CSVTail.
+#
+# Kept free of stable_baselines3 and torch, which only the child imports.
+
+def _run(settings, progress, cancel, kwargs):
+    try:
+        from utils.training import train
+        status = train(settings, progress=progress, cancel=cancel, **kwargs)
+    except Exception as e:
+        traceback.print_exc()
+        progress.put({"status": "error", "text": f"Error:\n{e}"})
+        return
+
+    progress.put({"status": status, "text": "Training finished." if status == "finished" else "Training cancelled."})
+
+class TrainingProcess():
+    def __init__(self, settings, **kwargs):
+        # Spawned on every platform, forking a process that has a window open isn't safe on macOS and doesn't exist on
+        # Windows. run.py and train.py keep their startup under a __main__ guard for this. The child isn't a daemon,
+        # daemons can't start the vec env's worker processes, so it is cancelled at exit instead of being killed
+        ctx = mp.get_context("spawn")
+
+        self.queue = ctx.Queue()
+        self.cancel_event = ctx.Event()
+        self.process = ctx.Process(target=_run, args=(dict(settings), self.queue, self.cancel_event, kwargs))
+
+        self.state = {"status": "starting", "text": "Starting training...", "metrics": {}}
+        self.columns = None
+        self.episodes = []
+
+    def start(self):
+        self.process.start()
+        atexit.register(self.cancel)
+
+    def running(self):
+        return self.state["status"] in ("starting", "running")
+
+    def poll(self):
+        # True when anything changed. The alive check comes first, so a child that exited has sent all it ever will
+        alive = self.process.is_alive()
+        changed = False
+
+        while True:
+            try:
+                message = self.queue.get_nowait()
+            except queue.Empty:
+                break
+
+            changed = True
+            if "episodes" in message:
+                self.columns = message.pop("columns")
+                self.episodes.append(message.pop("episodes"))
+            self.state.update(message)
+
+        if not alive and self.running() and self.process.exitcode is not None:
+            self.state.update(status="error", text=f"Training process exited with code {self.process.exitcode}")
+            changed = True
+
+        return changed
+
+    def read_new(self):
+        if not self.episodes:
+            return [], False
+
+        rows = np.concatenate(self.episodes)
+        self.episodes = []
+        return rows, False
+
+    def cancel(self):
+        # learn() stops at its next env step, and nothing is saved
+        if self.running():
+            self.state["text"] = "Cancelling..."
+        self.cancel_event.set()
+
+    def stop(self, timeout=10):
+        self.cancel()
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
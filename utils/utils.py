@@ -1,6 +1,6 @@
 import logging, arcade, arcade.gui, sys, traceback
 
-from utils.constants import menu_background_color
+from utils.constants import menu_background_color, max_update_rate
 
 import pyglet.info, pyglet.event
 
@@ -38,6 +38,11 @@ def print_debug_info():
     logging.debug('########################## DEBUG INFO ##########################')
     logging.debug('')
 
+def get_atlas_usage(atlas=None):
+    # textures stay flat once every sprite type shares its texture, a growing count means something keeps making new ones
+    atlas = atlas or arcade.get_window().ctx.default_atlas
+    return {"textures": len(atlas.textures), "unique_textures": len(atlas.unique_textures), "images": len(atlas.images)}
+
 class ErrorView(arcade.gui.UIView):
     def __init__(self, message, title):
         super().__init__()
@@ -81,6 +86,23 @@ def get_closest_resolution():
         )
     return closest_resolution
 
+def set_frame_rate(window, vsync, fps_limit):
+    # on_update only accumulates time between simulation ticks, so it never needs to run faster than the screen is drawn
+    if vsync:
+        window.set_vsync(True)
+        display_mode = window.display.get_default_screen().get_mode()
+        refresh_rate = display_mode.rate if display_mode else 60
+        window.set_update_rate(1 / refresh_rate)
+        window.set_draw_rate(1 / refresh_rate)
+    elif not fps_limit == 0:
+        window.set_vsync(False)
+        window.set_update_rate(1 / fps_limit)
+        window.set_draw_rate(1 / fps_limit)
+    else:
+        window.set_vsync(False)
+        window.set_update_rate(1 / max_update_rate)
+        window.set_draw_rate(1 / 99999999)
+
 class FakePyPresence():
     def __init__(self):
         ...
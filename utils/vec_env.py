@@ -0,0 +1,701 @@
+import gymnasium as gym
+import numpy as np
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import os
+
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv
+
+from utils.game_constants import PLAYER_SPEED, BULLET_SPEED, BULLET_RADIUS, BULLET_CAPACITY, ENEMY_SPEED, ENEMY_SPACING, SHIP_SIZE, PLAYER_Y, DIFFICULTY_LEVELS
+from utils.profiling import PhaseTimer
+
+class SpaceInvadersVecEnv(VecEnv):
+    # Same game as SpaceInvadersEnv, but every env lives in a row of a NumPy array and all of them advance together.
+    def __init__(self, n_envs, width=800, height=600, difficulty="Hard", bullet_capacity=BULLET_CAPACITY, seed=None, profile=False, frame_skip=1, levels=None):
+        # levels are the difficulties envs can be moved between later by setting next_level, an index into levels, which
+        # each env picks up at its next reset. The formation grid is sized for the largest of them. Every env starts on difficulty.
+        levels = list(levels or [difficulty])
+        for name in levels:
+            if name not in DIFFICULTY_LEVELS or not DIFFICULTY_LEVELS[name]:
+                raise ValueError(f"Unknown difficulty: {name}. Available: {[key for key, value in DIFFICULTY_LEVELS.items() if value]}")
+
+        if difficulty not in levels:
+            raise ValueError(f"Starting difficulty {difficulty} isn't one of the levels {levels}")
+
+        self.width = width
+        self.height = height
+        self.render_mode = None
+        self.difficulty_settings = DIFFICULTY_LEVELS[difficulty]
+        self.levels = levels
+        self.level_settings = {key: np.array([DIFFICULTY_LEVELS[name][key] for name in levels], dtype=np.int64) for key in ("enemy_rows", "enemy_cols", "player_respawns", "enemy_respawns")}
+
+        self.max_steps = 2000
+        self.frame_skip = frame_skip
+        self.player_attack_cooldown_steps = 5
+        self.enemy_move_speed = ENEMY_SPEED
+        self.bullet_capacity = bullet_capacity
+
+        self.rng = np.random.default_rng(seed)
+
+        self.phase_timer = PhaseTimer()
+        self.timer = self.phase_timer if profile else None # _step() only times phases while this is set
+
+        self.level = np.full(n_envs, levels.index(difficulty), dtype=np.int64)
+        self.next_level = self.level.copy()
+        self.enemy_rows = self.level_settings["enemy_rows"][self.level]
+        self.enemy_cols = self.level_settings["enemy_cols"][self.level]
+        self.player_respawns = self.level_settings["player_respawns"][self.level]
+        self.enemy_respawns = self.level_settings["enemy_respawns"][self.level]
+
+        rows, cols = int(self.level_settings["enemy_rows"].max()), int(self.level_settings["enemy_cols"].max())
+        self.row_offsets = np.arange(rows) * float(ENEMY_SPACING)
+        self.col_offsets = np.arange(cols) * float(ENEMY_SPACING)
+        self.grid_rows = np.arange(rows)[None, :, None]
+        self.grid_cols = np.arange(cols)[None, None, :]
+        self.formation_cells = (self.grid_rows < self.enemy_rows[:, None, None]) & (self.grid_cols < self.enemy_cols[:, None, None])
+
+        self.enemy_alive = np.zeros((n_envs, rows, cols), dtype=bool)
+        self.formation_x = np.zeros(n_envs)
+        self.formation_y = np.zeros(n_envs)
+
+        self.player_x = np.zeros(n_envs)
+        self.player_speed = np.zeros(n_envs)
+        self.player_alive = np.ones(n_envs, dtype=bool)
+        self.current_cooldown = np.zeros(n_envs, dtype=np.int64)
+        self.current_step = np.zeros(n_envs, dtype=np.int64)
+        self.enemies_killed = np.zeros(n_envs, dtype=np.int64)
+        self.won = np.zeros(n_envs, dtype=bool)
+        self.player_respawns_remaining = np.zeros(n_envs, dtype=np.int64)
+        self.enemy_respawns_remaining = np.zeros(n_envs, dtype=np.int64)
+
+        # direction_y of every bullet slot, 0 means the slot is free
+        self.bullet_x = np.zeros((n_envs, bullet_capacity))
+        self.bullet_y = np.zeros((n_envs, bullet_capacity))
+        self.bullet_direction = np.zeros((n_envs, bullet_capacity), dtype=np.int8)
+        self.bullet_born = np.zeros((n_envs, bullet_capacity), dtype=np.int64) # the step it was fired, slots are reused in any order
+
+        self.actions = np.zeros(n_envs, dtype=np.int64)
+        self.buf_obs = np.zeros((n_envs, 12), dtype=np.float32)
+        self.buf_rews = np.zeros(n_envs, dtype=np.float32)
+        self.buf_dones = np.zeros(n_envs, dtype=bool)
+        self.buf_info = np.zeros((n_envs, len(INFO_KEYS)), dtype=np.int64)
+        self.buf_terminal_obs = np.zeros((n_envs, 12), dtype=np.float32)
+
+        super().__init__(n_envs, gym.spaces.Box(low=-2.0, high=2.0, shape=(12,), dtype=np.float32), gym.spaces.Discrete(4))
+
+    def reset(self):
+        if self._seeds[0] is not None:
+            self.rng = np.random.default_rng(self._seeds[0])
+
+        self._reset_envs(np.arange(self.num_envs))
+        self._reset_seeds()
+        self._reset_options()
+
+        return self._observe().copy()
+
+    def step_async(self, actions):
+        self.actions = np.asarray(actions).reshape(self.num_envs)
+
+    def step_wait(self):
+        self._step()
+        return self.buf_obs.copy(), self.buf_rews.copy(), self.buf_dones.copy(), build_infos(self.buf_info, self.buf_dones, self.buf_terminal_obs)
+
+    def enable_profiling(self, enabled=True):
+        self.timer = self.phase_timer if enabled else None
+
+    def get_phase_times(self, reset=False):
+        # one set of times for the whole batch, a phase's calls count batched steps
+        stats = self.phase_timer.stats()
+        if reset:
+            self.phase_timer.reset()
+
+        return stats
+
+    def _step(self):
+        # fills buf_obs, buf_rews, buf_dones, buf_info and buf_terminal_obs, infos are left to the caller so worker processes can skip them
+        timer = self.timer
+        if timer:
+            timer.start()
+
+        n = self.num_envs
+        reward = np.zeros(n)
+        terminated = np.zeros(n, dtype=bool)
+        truncated = np.zeros(n, dtype=bool)
+        done = np.zeros(n, dtype=bool)
+        snapshotted = np.zeros(n, dtype=bool)
+
+        # Every env repeats its action for frame_skip ticks. An env whose episode ends early keeps ticking with the rest,
+        # but its later rewards are dropped and its terminal observation and info are taken at the tick it ended.
+        for tick in range(self.frame_skip):
+            tick_reward = np.zeros(n)
+            tick_terminated = np.zeros(n, dtype=bool)
+            self._tick(tick_reward, tick_terminated, timer)
+
+            reward += np.where(done, 0.0, tick_reward)
+            ended = (tick_terminated | (self.current_step >= self.max_steps)) & ~done
+            terminated |= tick_terminated & ended
+            truncated |= ended & ~tick_terminated
+            done |= ended
+
+            if tick < self.frame_skip - 1 and ended.any():
+                if done.all():
+                    break
+
+                ended_idx = np.flatnonzero(ended)
+                self.buf_terminal_obs[ended_idx] = self._observe()[ended_idx]
+                self._write_info(ended_idx)
+                snapshotted[ended_idx] = True
+
+                if timer:
+                    timer.lap("observe")
+
+        obs = self._observe()
+
+        if timer:
+            timer.lap("observe")
+
+        dones = terminated | truncated
+        self.buf_rews[:] = reward
+        self.buf_dones[:] = dones
+        self._write_info(np.flatnonzero(~snapshotted))
+        self.buf_info[:, 4] = truncated & ~terminated
+
+        done_idx = np.flatnonzero(dones)
+        if len(done_idx):
+            late_idx = np.flatnonzero(dones & ~snapshotted)
+            self.buf_terminal_obs[late_idx] = obs[late_idx]
+            self._reset_envs(done_idx)
+            self._observe()
+
+        if timer:
+            timer.lap("autoreset")
+
+    def _write_info(self, env_idx):
+        self.buf_info[env_idx, 0] = self.enemies_killed[env_idx]
+        self.buf_info[env_idx, 1] = self.current_step[env_idx]
+        self.buf_info[env_idx, 2] = self.player_respawns_remaining[env_idx]
+        self.buf_info[env_idx, 3] = self.enemy_respawns_remaining[env_idx]
+        self.buf_info[env_idx, 5] = self.level[env_idx]
+        self.buf_info[env_idx, 6] = self.won[env_idx]
+
+    def _tick(self, reward, terminated, timer):
+        # one game tick for every env, adding into reward and terminated
+        actions = self.actions
+        self.current_step += 1
+
+        np.maximum(self.current_cooldown - 1, 0, out=self.current_cooldown)
+
+        prev_x = self.player_x.copy()
+        self.player_x += PLAYER_SPEED * ((actions == 1).astype(np.float64) - (actions == 0))
+
+        wants_shoot = actions == 3
+        can_shoot = self.current_cooldown <= 0
+        fire = wants_shoot & can_shoot
+        self.current_cooldown[fire] = self.player_attack_cooldown_steps
+        reward += 0.01 * fire - 0.02 * (wants_shoot & ~can_shoot)
+        fire_idx = np.flatnonzero(fire)
+        self._spawn_bullets(fire_idx, self.player_x[fire_idx], np.full(len(fire_idx), PLAYER_Y), 1)
+
+        live_cols = self.enemy_alive.any(axis=1)
+        has_enemies = live_cols.any(axis=1)
+
+        column_x = self.formation_x[:, None] + self.col_offsets
+        nearest_dist = np.where(live_cols, np.abs(column_x - self.player_x[:, None]), np.inf).min(axis=1)
+        reward += 0.005 * (has_enemies & (nearest_dist / self.width < 0.025))
+
+        np.clip(self.player_x, 0, self.width, out=self.player_x)
+        self.player_speed = (self.player_x - prev_x) / max(1e-6, PLAYER_SPEED)
+
+        if timer:
+            timer.lap("player")
+
+        self._move_formation(has_enemies, live_cols)
+
+        if timer:
+            timer.lap("formation")
+
+        self._update_bullets(reward, terminated)
+
+        if timer:
+            timer.lap("bullets")
+
+        # an enemy reaching the player's row counts as a hit
+        live_rows = self.enemy_alive.any(axis=2)
+        has_enemies = live_rows.any(axis=1)
+        lowest_row = live_rows.shape[1] - 1 - np.argmax(live_rows[:, ::-1], axis=1)
+        reached = self.player_alive & has_enemies & (self.formation_y - self.row_offsets[lowest_row] <= PLAYER_Y)
+        self._kill_players(np.flatnonzero(reached), reward, terminated)
+
+        cleared = np.flatnonzero(~has_enemies)
+        if len(cleared):
+            reward[cleared] += 50.0
+            respawn = cleared[self.enemy_respawns_remaining[cleared] > 0]
+            finished = cleared[self.enemy_respawns_remaining[cleared] <= 0]
+
+            self.enemy_respawns_remaining[respawn] -= 1
+            self._reset_formation(respawn)
+            reward[respawn] += 20.0
+
+            reward[finished] += 100.0
+            terminated[finished] = True
+            self.won[finished] = True
+
+        if timer:
+            timer.lap("deaths")
+
+        self._enemies_shoot()
+
+        if timer:
+            timer.lap("enemy_fire")
+
+        edge_threshold = self.width * 0.1
+        reward -= 0.03 * (self.player_alive & ((self.player_x < edge_threshold) | (self.player_x > self.width - edge_threshold)))
+        reward -= 0.01
+
+        if timer:
+            timer.lap("reward")
+
+    def _reset_envs(self, env_idx):
+        self._apply_levels(env_idx)
+
+        self.player_x[env_idx] = self.width / 2 + self.rng.integers(int(-self.width / 3), int(self.width / 3) + 1, size=len(env_idx))
+        self.player_speed[env_idx] = 0.0
+        self.player_alive[env_idx] = True
+        self.current_cooldown[env_idx] = 0
+        self.current_step[env_idx] = 0
+        self.enemies_killed[env_idx] = 0
+        self.won[env_idx] = False
+        self.player_respawns_remaining[env_idx] = self.player_respawns[env_idx]
+        self.enemy_respawns_remaining[env_idx] = self.enemy_respawns[env_idx]
+        self.bullet_direction[env_idx] = 0
+
+        self._reset_formation(env_idx)
+
+    def _apply_levels(self, env_idx):
+        changed = env_idx[self.level[env_idx] != self.next_level[env_idx]]
+        if not len(changed):
+            return
+
+        level = self.next_level[changed]
+        self.level[changed] = level
+        self.enemy_rows[changed] = self.level_settings["enemy_rows"][level]
+        self.enemy_cols[changed] = self.level_settings["enemy_cols"][level]
+        self.player_respawns[changed] = self.level_settings["player_respawns"][level]
+        self.enemy_respawns[changed] = self.level_settings["enemy_respawns"][level]
+        self.formation_cells[changed] = (self.grid_rows < self.enemy_rows[changed, None, None]) & (self.grid_cols < self.enemy_cols[changed, None, None])
+
+    def _reset_formation(self, env_idx):
+        self.formation_x[env_idx] = self.width * 0.15
+        self.formation_y[env_idx] = self.height * 0.9
+        self.enemy_alive[env_idx] = self.formation_cells[env_idx]
+
+    def _move_formation(self, has_enemies, live_cols):
+        half = SHIP_SIZE / 2
+        moving = has_enemies & self.player_alive
+
+        center_x = self.formation_x + self.enemy_cols * (ENEMY_SPACING / 2)
+        dx = np.sign(self.player_x - center_x) * self.enemy_move_speed * moving
+
+        cols = live_cols.shape[1]
+        first_col = np.argmax(live_cols, axis=1)
+        last_col = cols - 1 - np.argmax(live_cols[:, ::-1], axis=1)
+        new_x = self.formation_x + dx
+        wall_hit = (new_x + self.col_offsets[last_col] + half > self.width) | (new_x + self.col_offsets[first_col] < half)
+        self.formation_x = np.where(wall_hit, self.formation_x, new_x)
+
+        vertical = moving & (self.rng.random(self.num_envs) < 0.02)
+        dy = np.where(self.rng.random(self.num_envs) < 0.5, -1.0, 1.0) * self.enemy_move_speed * vertical
+
+        live_rows = self.enemy_alive.any(axis=2)
+        rows = live_rows.shape[1]
+        first_row = np.argmax(live_rows, axis=1)
+        last_row = rows - 1 - np.argmax(live_rows[:, ::-1], axis=1)
+        new_y = self.formation_y + dy
+        wall_hit = (new_y - self.row_offsets[first_row] + half > self.height) | (new_y - self.row_offsets[last_row] < half)
+        self.formation_y = np.where(wall_hit, self.formation_y, new_y)
+
+    def _spawn_bullets(self, env_idx, x, y, direction_y):
+        # an env with all bullet_capacity slots in flight drops the shot, the same as BulletPool in the scalar env
+        if not len(env_idx):
+            return
+
+        free = self.bullet_direction[env_idx] == 0
+        has_slot = free.any(axis=1)
+        env_idx, x, y = env_idx[has_slot], x[has_slot], y[has_slot]
+        slot = np.argmax(free[has_slot], axis=1)
+
+        self.bullet_x[env_idx, slot] = x
+        self.bullet_y[env_idx, slot] = y
+        self.bullet_direction[env_idx, slot] = direction_y
+        self.bullet_born[env_idx, slot] = self.current_step[env_idx]
+
+    def _update_bullets(self, reward, terminated):
+        half = SHIP_SIZE / 2
+        radius = BULLET_RADIUS / 2
+
+        self.bullet_y += self.bullet_direction * BULLET_SPEED
+        self.bullet_direction[(self.bullet_y > self.height) | (self.bullet_y < 0)] = 0
+
+        # enemies sit on a regular grid and are further apart than a bullet is wide, so only the nearest cell can be hit
+        rows, cols = self.enemy_alive.shape[1:]
+        env_idx, slot = np.nonzero(self.bullet_direction == 1)
+        if len(env_idx):
+            bx, by = self.bullet_x[env_idx, slot], self.bullet_y[env_idx, slot]
+            fx, fy = self.formation_x[env_idx], self.formation_y[env_idx]
+
+            col = np.clip(np.rint((bx - fx) / ENEMY_SPACING).astype(np.int64), 0, cols - 1)
+            row = np.clip(np.rint((fy - by) / ENEMY_SPACING).astype(np.int64), 0, rows - 1)
+            hit = self.enemy_alive[env_idx, row, col] & circle_rect_overlap(bx, by, radius, fx + self.col_offsets[col], fy - self.row_offsets[row], half, half)
+
+            if hit.any():
+                env_idx, slot, row, col = env_idx[hit], slot[hit], row[hit], col[hit]
+                # two bullets in the same cell only kill once, the one fired first wins like in the scalar env's bullet list
+                cell = (env_idx * rows + row) * cols + col
+                order = np.lexsort((self.bullet_born[env_idx, slot], cell))
+                _, first = np.unique(cell[order], return_index=True)
+                first = order[first]
+                env_idx, slot, row, col = env_idx[first], slot[first], row[first], col[first]
+
+                self.enemy_alive[env_idx, row, col] = False
+                self.bullet_direction[env_idx, slot] = 0
+                np.add.at(reward, env_idx, 10.0)
+                np.add.at(self.enemies_killed, env_idx, 1)
+
+        env_idx, slot = np.nonzero(self.bullet_direction == -1)
+        if len(env_idx):
+            hit = self.player_alive[env_idx] & circle_rect_overlap(self.bullet_x[env_idx, slot], self.bullet_y[env_idx, slot], radius, self.player_x[env_idx], PLAYER_Y, half, half)
+            self._kill_players(np.unique(env_idx[hit]), reward, terminated)
+
+    def _kill_players(self, env_idx, reward, terminated):
+        if not len(env_idx):
+            return
+
+        reward[env_idx] -= 10.0
+        self.player_alive[env_idx] = False
+
+        # same as a respawn in SpaceInvadersEnv, enemy bullets are cleared
+        bullets = self.bullet_direction[env_idx]
+        bullets[bullets == -1] = 0
+        self.bullet_direction[env_idx] = bullets
+
+        respawn = env_idx[self.player_respawns_remaining[env_idx] > 0]
+        self.player_respawns_remaining[respawn] -= 1
+        self.player_x[respawn] = self.width / 2 + self.rng.integers(int(-self.width / 3), int(self.width / 3) + 1, size=len(respawn))
+        self.player_alive[respawn] = True
+        self.current_cooldown[respawn] = 0
+
+        terminated[env_idx[~self.player_alive[env_idx]]] = True
+
+    def _enemies_shoot(self):
+        live_cols = self.enemy_alive.any(axis=1)
+        enemy_count = self.enemy_alive.sum(axis=(1, 2))
+
+        shooting_prob = 0.05 + 0.05 * (1.0 - enemy_count / (self.enemy_rows * self.enemy_cols))
+        env_idx = np.flatnonzero((enemy_count > 0) & (self.rng.random(self.num_envs) < shooting_prob))
+        if not len(env_idx):
+            return
+
+        # a random column that still has enemies, and the lowest enemy in it
+        keys = np.where(live_cols[env_idx], self.rng.random((len(env_idx), live_cols.shape[1])), -1.0)
+        col = np.argmax(keys, axis=1)
+        column = self.enemy_alive[env_idx, :, col]
+        row = column.shape[1] - 1 - np.argmax(column[:, ::-1], axis=1)
+
+        self._spawn_bullets(env_idx, self.formation_x[env_idx] + self.col_offsets[col], self.formation_y[env_idx] - self.row_offsets[row], -1)
+
+    def _observe(self):
+        alive = self.player_alive
+        px = self.player_x
+        obs = self.buf_obs
+
+        per_col = self.enemy_alive.sum(axis=1)
+        live_cols = per_col > 0
+        live_rows = self.enemy_alive.any(axis=2)
+        enemy_count = per_col.sum(axis=1)
+        visible = (enemy_count > 0) & alive
+
+        column_x = self.formation_x[:, None] + self.col_offsets
+        # ties in x go to the column whose top enemy comes first in row-major order, like EnemyFormation.nearest_enemy
+        column_dist = np.where(live_cols, np.abs(column_x - px[:, None]), np.inf)
+        column_top = np.argmax(self.enemy_alive, axis=1)
+        tied = column_dist == column_dist.min(axis=1, keepdims=True)
+        nearest_col = np.argmin(np.where(tied, column_top * live_cols.shape[1] + np.arange(live_cols.shape[1]), np.iinfo(np.int64).max), axis=1)
+        nearest_row = np.take_along_axis(column_top, nearest_col[:, None], axis=1)[:, 0]
+        lowest_row = live_rows.shape[1] - 1 - np.argmax(live_rows[:, ::-1], axis=1)
+
+        obs[:, 0] = np.where(alive, px / float(self.width), 0.5)
+        obs[:, 1] = np.where(visible, (self.formation_x + self.col_offsets[nearest_col] - px) / float(self.width), 2.0)
+        obs[:, 2] = np.where(visible, (self.formation_y - self.row_offsets[nearest_row] - PLAYER_Y) / float(self.height), 2.0)
+        obs[:, 3] = np.where(visible, (self.formation_y - self.row_offsets[lowest_row] - PLAYER_Y) / float(self.height), 2.0)
+
+        enemy_bullets = self.bullet_direction == -1
+        dx = self.bullet_x - px[:, None]
+        dy = self.bullet_y - PLAYER_Y
+        nearest_bullet = np.argmin(np.where(enemy_bullets, np.abs(dx) + np.abs(dy), np.inf), axis=1)[:, None]
+        has_bullet = enemy_bullets.any(axis=1) & alive
+        obs[:, 4] = np.where(has_bullet, np.take_along_axis(dx, nearest_bullet, axis=1)[:, 0] / float(self.width), 2.0)
+        obs[:, 5] = np.where(has_bullet, np.take_along_axis(dy, nearest_bullet, axis=1)[:, 0] / float(self.height), 2.0)
+
+        obs[:, 6] = self.player_speed
+        obs[:, 7] = enemy_count / np.maximum(1, self.enemy_rows * self.enemy_cols)
+
+        # std of the enemy x positions, the formation offset cancels out so only the column counts matter
+        count = np.maximum(enemy_count, 1)
+        mean = (per_col * self.col_offsets).sum(axis=1) / count
+        variance = (per_col * (self.col_offsets - mean[:, None]) ** 2).sum(axis=1) / count
+        obs[:, 8] = np.sqrt(variance) / float(self.width)
+
+        obs[:, 9] = alive & (self.current_cooldown <= 0)
+        obs[:, 10] = self.player_respawns_remaining / np.maximum(1, self.player_respawns)
+        obs[:, 11] = self.enemy_respawns_remaining / np.maximum(1, self.enemy_respawns)
+
+        return obs
+
+    def close(self):
+        pass
+
+    def get_attr(self, attr_name, indices=None):
+        value = getattr(self, attr_name)
+        indices = self._get_indices(indices)
+
+        if isinstance(value, np.ndarray) and value.shape[:1] == (self.num_envs,):
+            return [value[i] for i in indices]
+
+        return [value for _ in indices]
+
+    def set_attr(self, attr_name, value, indices=None):
+        current = getattr(self, attr_name, None)
+
+        if isinstance(current, np.ndarray) and current.shape[:1] == (self.num_envs,):
+            current[list(self._get_indices(indices))] = value
+        else:
+            setattr(self, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        # all envs share one object, so the method runs once and its result is handed to every index
+        result = getattr(self, method_name)(*method_args, **method_kwargs)
+        return [result for _ in self._get_indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
+
+INFO_KEYS = ("enemies_killed", "step", "player_respawns_remaining", "enemy_respawns_remaining", "TimeLimit.truncated", "level", "won")
+
+def build_infos(buf_info, dones, terminal_obs):
+    infos = [dict(zip(INFO_KEYS, row)) for row in buf_info.tolist()]
+
+    for i in np.flatnonzero(dones):
+        infos[i]["terminal_observation"] = terminal_obs[i].copy()
+
+    for info in infos:
+        info["TimeLimit.truncated"] = bool(info["TimeLimit.truncated"])
+        info["won"] = bool(info["won"])
+
+    return infos
+
+def circle_rect_overlap(cx, cy, radius, rx, ry, half_width, half_height):
+    dx = np.maximum(np.abs(cx - rx) - half_width, 0.0)
+    dy = np.maximum(np.abs(cy - ry) - half_height, 0.0)
+    return dx * dx + dy * dy <= radius * radius
+
+class SharedMemoryVecEnv(VecEnv):
+    # Splits the envs over worker processes, each stepping its slice as a SpaceInvadersVecEnv.
+    # Actions, observations, rewards, dones and infos go through shared memory, the pipes only carry short commands.
+    def __init__(self, n_envs, n_workers, cpu_affinity=None, seed=None, **env_kwargs):
+        n_workers = max(1, min(n_workers, n_envs))
+
+        self.buffers = {name: _SharedArray((n_envs, *shape), dtype) for name, (shape, dtype) in SHARED_BUFFERS.items()}
+        self.actions, self.buf_obs, self.buf_rews, self.buf_dones, self.buf_info, self.buf_terminal_obs = (self.buffers[name].array for name in SHARED_BUFFERS)
+
+        bounds = np.linspace(0, n_envs, n_workers + 1).astype(int)
+        self.slices = [(int(start), int(stop)) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+        # the platform's default start method, spawn on Windows and macOS re-imports the launching script in every worker,
+        # so run.py, train.py and the other entry points keep their startup under a __main__ guard
+        ctx = mp.get_context()
+        seed = int(np.random.randint(0, np.iinfo(np.uint32).max, dtype=np.uint32)) if seed is None else seed
+
+        self.remotes, self.processes = [], []
+        for index, (start, stop) in enumerate(self.slices):
+            remote, work_remote = ctx.Pipe()
+            cpu = cpu_affinity[index % len(cpu_affinity)] if cpu_affinity else None
+
+            process = ctx.Process(target=_shared_memory_worker, args=(work_remote, remote, self.buffers, start, stop, cpu, seed + index, env_kwargs), daemon=True)
+            process.start()
+            work_remote.close()
+
+            self.remotes.append(remote)
+            self.processes.append(process)
+
+        self.closed = False
+
+        self.remotes[0].send(("get_spaces", None))
+        observation_space, action_space = self.remotes[0].recv()
+
+        super().__init__(n_envs, observation_space, action_space)
+
+    def _command(self, command, data=None):
+        for remote in self.remotes:
+            remote.send((command, data))
+
+        return [remote.recv() for remote in self.remotes]
+
+    def reset(self):
+        seed = self._seeds[0]
+        self._command("reset", seed)
+        self._reset_seeds()
+        self._reset_options()
+
+        return self.buf_obs.copy()
+
+    def step_async(self, actions):
+        self.actions[:] = np.asarray(actions).reshape(self.num_envs)
+
+        for remote in self.remotes:
+            remote.send(("step", None))
+
+    def step_wait(self):
+        for remote in self.remotes:
+            remote.recv()
+
+        return self.buf_obs.copy(), self.buf_rews.copy(), self.buf_dones.copy(), build_infos(self.buf_info, self.buf_dones, self.buf_terminal_obs)
+
+    def close(self):
+        if self.closed:
+            return
+
+        for remote in self.remotes:
+            remote.send(("close", None))
+
+        for process in self.processes:
+            process.join()
+
+        for buffer in self.buffers.values():
+            buffer.release()
+
+        self.closed = True
+
+    def _worker_indices(self, indices):
+        # groups env indices by the worker that owns them, as indices local to that worker
+        grouped = {}
+
+        for i in self._get_indices(indices):
+            for worker, (start, stop) in enumerate(self.slices):
+                if start <= i < stop:
+                    grouped.setdefault(worker, []).append(i - start)
+                    break
+
+        return grouped
+
+    def get_attr(self, attr_name, indices=None):
+        grouped = self._worker_indices(indices)
+
+        for worker, local in grouped.items():
+            self.remotes[worker].send(("get_attr", (attr_name, local)))
+
+        return [value for worker in grouped for value in self.remotes[worker].recv()]
+
+    def set_attr(self, attr_name, value, indices=None):
+        grouped = self._worker_indices(indices)
+
+        for worker, local in grouped.items():
+            self.remotes[worker].send(("set_attr", (attr_name, value, local)))
+
+        for worker in grouped:
+            self.remotes[worker].recv()
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        grouped = self._worker_indices(indices)
+
+        for worker, local in grouped.items():
+            self.remotes[worker].send(("env_method", (method_name, method_args, method_kwargs, local)))
+
+        return [value for worker in grouped for value in self.remotes[worker].recv()]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
+
+# name -> (shape after n_envs, dtype), in the order SharedMemoryVecEnv unpacks them
+SHARED_BUFFERS = {
+    "actions": ((), np.int64),
+    "obs": ((12,), np.float32),
+    "rews": ((), np.float32),
+    "dones": ((), bool),
+    "info": ((len(INFO_KEYS),), np.int64),
+    "terminal_obs": ((12,), np.float32)
+}
+
+class _SharedArray():
+    def __init__(self, shape, dtype):
+        self.shape = shape
+        self.dtype = np.dtype(dtype)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * self.dtype.itemsize))
+        self.array = np.ndarray(shape, dtype=self.dtype, buffer=self.shm.buf)
+        self.array[...] = 0
+
+    def __getstate__(self):
+        return {"name": self.shm.name, "shape": self.shape, "dtype": self.dtype}
+
+    def __setstate__(self, state):
+        self.shape = state["shape"]
+        self.dtype = state["dtype"]
+        self.shm = shared_memory.SharedMemory(name=state["name"])
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=self.shm.buf)
+
+    def release(self):
+        del self.array
+        self.shm.close()
+        self.shm.unlink()
+
+def _shared_memory_worker(remote, parent_remote, buffers, start, stop, cpu, seed, env_kwargs):
+    parent_remote.close()
+
+    if cpu is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {cpu})
+
+    actions, obs, rews, dones, info, terminal_obs = (buffers[name].array[start:stop] for name in SHARED_BUFFERS)
+    env = SpaceInvadersVecEnv(stop - start, seed=seed, **env_kwargs)
+
+    try:
+        while True:
+            command, data = remote.recv()
+
+            if command == "step":
+                env.actions = actions
+                env._step()
+                obs[:] = env.buf_obs
+                rews[:] = env.buf_rews
+                dones[:] = env.buf_dones
+                info[:] = env.buf_info
+                terminal_obs[:] = env.buf_terminal_obs
+                remote.send(None)
+            elif command == "reset":
+                if data is not None:
+                    env.seed(data + start)
+                obs[:] = env.reset()
+                remote.send(None)
+            elif command == "get_spaces":
+                remote.send((env.observation_space, env.action_space))
+            elif command == "get_attr":
+                attr_name, indices = data
+                remote.send(env.get_attr(attr_name, indices))
+            elif command == "set_attr":
+                attr_name, value, indices = data
+                remote.send(env.set_attr(attr_name, value, indices))
+            elif command == "env_method":
+                method_name, method_args, method_kwargs, indices = data
+                remote.send(env.env_method(method_name, *method_args, indices=indices, **method_kwargs))
+            elif command == "close":
+                break
+    except (KeyboardInterrupt, EOFError):
+        pass
+    finally:
+        remote.close()
+
+def make_vec_env(n_envs, n_workers=0, cpu_affinity=False, **env_kwargs):
+    # n_workers 0 steps every env in this process, otherwise they are split over that many worker processes
+    if n_workers <= 0:
+        return SpaceInvadersVecEnv(n_envs, **env_kwargs)
+
+    cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    return SharedMemoryVecEnv(n_envs, n_workers, cpu_affinity=cpus if cpu_affinity else None, **env_kwargs)